@@ -0,0 +1,188 @@
+"""Vectorized backtest of trading rules on the 15 minute return predictions.
+
+Turns a series of predicted ``target`` returns into positions, trading costs
+and PnL for a whole batch of parameter sets at once. Every parameter set is a
+row of a frame (see :func:`param_grid`) with
+
+* ``threshold``: trade only when ``|prediction|`` exceeds it,
+* ``sizing``: ``'sign'`` (full size in the predicted direction) or
+  ``'linear'`` (``prediction / scale``, clipped to +-1),
+* ``scale``: the prediction that earns full size under ``'linear'``,
+* ``allow_short``: whether negative predictions go short or stay flat,
+* ``fee``: taker fee per unit traded (Binance spot: 0.1%),
+* ``slippage``: fraction of the minute's high-low range, relative to its
+  vwap, lost per unit traded on top of the fee.
+
+Holds last ``horizon`` minutes. With ``overlapping=True`` a new
+``1 / horizon`` tranche opens every minute and the oldest one closes, so the
+position is the mean signal of the last ``horizon`` minutes; otherwise the
+position is reset to the current signal on a fixed ``horizon``-minute grid
+and held until the next reset. Fills are at the close, PnL is additive
+(not compounded) and positions carry from one minute to the next.
+
+The simulation walks the history in chunks of minutes, each a handful of
+``(sets, minutes)`` array operations, so millions of minutes times hundreds
+of parameter sets stay within a bounded amount of memory.
+
+    >>> params = param_grid(threshold=[0, 5e-4, 1e-3], sizing=['sign', 'linear'], fee=[0.001, 0.00075])
+    >>> result = backtest(predictions, d, params)
+    >>> result.metrics.sort_values('sharpe', ascending=False).head()
+"""
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from features import candle_arrays
+from sessions import MINUTES_PER_DAY
+from store import INDEX_COLUMN, from_minutes
+
+DEFAULTS = {'threshold': 0.0, 'sizing': 'sign', 'scale': 1e-3, 'allow_short': True, 'fee': 0.001, 'slippage': 0.1}
+# Upper bound on (sets x minutes) elements per chunk array.
+CHUNK_ELEMENTS = 1 << 23
+
+
+def param_grid(**values) -> pd.DataFrame:
+    """Every combination of the given parameter values, defaults for the rest."""
+    grid = {name: values.get(name, [default]) for name, default in DEFAULTS.items()}
+    unknown = set(values) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f'unknown parameters {sorted(unknown)}, expected {list(DEFAULTS)}')
+    return pd.DataFrame(list(itertools.product(*grid.values())), columns=list(grid))
+
+
+@dataclass
+class BacktestResult:
+    """``metrics`` has one row per parameter set; ``daily`` is its daily PnL, ``(days, sets)``.
+
+    ``equity`` is the cumulative additive PnL at each day's end.
+    """
+
+    metrics: pd.DataFrame
+    daily: pd.DataFrame
+
+    @property
+    def equity(self) -> pd.DataFrame:
+        return self.daily.cumsum()
+
+
+def _signals(prediction: np.ndarray, params: dict) -> np.ndarray:
+    # (sets, minutes) target positions from one row of predictions.
+    p = prediction[None, :]
+    size = np.where(params['linear'], np.clip(p / params['scale'], -1, 1), np.sign(p))
+    size = np.where(np.abs(p) > params['threshold'], size, 0.0)
+    size = np.where(params['allow_short'], size, np.maximum(size, 0.0))
+    return np.nan_to_num(size, nan=0.0)
+
+
+def backtest(predictions, candles, params: pd.DataFrame | None = None, horizon: int = 15,
+             overlapping: bool = True, offset: int = 0) -> BacktestResult:
+    """Simulate every parameter set in ``params`` on ``predictions``.
+
+    ``predictions`` is aligned with ``candles`` (a frame or store dict), one
+    value per minute, NaN where no prediction exists. A pandas Series is
+    aligned on the candle index first. Non-overlapping holds reset on the
+    minutes where ``(minute - offset) % horizon == 0``.
+    """
+    c = candle_arrays(candles)
+    minutes = np.asarray(c[INDEX_COLUMN], dtype=np.int64)
+    if isinstance(predictions, pd.Series):
+        predictions = predictions.reindex(from_minutes(minutes)).to_numpy()
+    prediction = np.asarray(predictions, dtype=np.float64)
+    if prediction.shape != minutes.shape:
+        raise ValueError(f'{prediction.shape[0]} predictions for {len(minutes)} candles')
+    params = param_grid() if params is None else params.reset_index(drop=True)
+    settings = {name: params[name].to_numpy() if name in params else np.full(len(params), default)
+                for name, default in DEFAULTS.items()}
+    unknown = set(settings['sizing']) - {'sign', 'linear'}
+    if unknown:
+        raise ValueError(f'unknown sizing {sorted(unknown)}')
+    column = {
+        'threshold': settings['threshold'].astype(np.float64)[:, None],
+        'scale': settings['scale'].astype(np.float64)[:, None],
+        'linear': (settings['sizing'] == 'linear')[:, None],
+        'allow_short': settings['allow_short'].astype(bool)[:, None],
+    }
+    fee = settings['fee'].astype(np.float64)[:, None]
+    slippage = settings['slippage'].astype(np.float64)[:, None]
+
+    close = np.asarray(c['close'], dtype=np.float64)
+    spread = (np.asarray(c['high'], dtype=np.float64) - np.asarray(c['low'], dtype=np.float64)) / np.asarray(
+        c['vwap'], dtype=np.float64)
+    spread = np.nan_to_num(spread, nan=0.0)
+    day = minutes // MINUTES_PER_DAY
+    first_day = int(day[0]) if len(day) else 0
+    days = int(day[-1]) - first_day + 1 if len(day) else 0
+
+    n_sets, n = len(params), len(minutes)
+    daily = np.zeros((n_sets, days))
+    history = np.zeros((n_sets, horizon - 1))
+    held = np.zeros(n_sets)
+    position = np.zeros(n_sets)
+    equity = np.zeros(n_sets)
+    peak = np.zeros(n_sets)
+    drawdown = np.zeros(n_sets)
+    traded = np.zeros(n_sets)
+    exposure = np.zeros(n_sets)
+    active = np.zeros(n_sets)
+    prev_close = np.nan
+
+    step = max(CHUNK_ELEMENTS // max(n_sets, 1), horizon)
+    for lo in range(0, n, step):
+        hi = min(lo + step, n)
+        signal = _signals(prediction[lo:hi], column)
+        if overlapping:
+            # Mean of the last ``horizon`` signals, one prefix sum per chunk.
+            stacked = np.concatenate([history, signal], axis=1)
+            csum = np.zeros((n_sets, stacked.shape[1] + 1))
+            np.cumsum(stacked, axis=1, out=csum[:, 1:])
+            pos = (csum[:, horizon:] - csum[:, :-horizon]) / horizon
+            history = stacked[:, stacked.shape[1] - (horizon - 1):]
+        else:
+            reset = (minutes[lo:hi] - offset) % horizon == 0
+            source = np.where(reset, np.arange(hi - lo), -1)
+            np.maximum.accumulate(source, out=source)
+            pos = np.where(source >= 0, signal[:, np.maximum(source, 0)], held[:, None])
+            held = pos[:, -1].copy()
+
+        returns = np.empty(hi - lo)
+        returns[0] = close[lo] / prev_close - 1 if lo else 0.0
+        np.divide(close[lo + 1:hi], close[lo:hi - 1], out=returns[1:])
+        returns[1:] -= 1
+        returns = np.nan_to_num(returns, nan=0.0)
+        prev_close = close[hi - 1]
+
+        before = np.concatenate([position[:, None], pos[:, :-1]], axis=1)
+        trades = np.abs(pos - before)
+        pnl = before * returns - trades * (fee + slippage * spread[lo:hi])
+        position = pos[:, -1].copy()
+
+        curve = equity[:, None] + np.cumsum(pnl, axis=1)
+        running_peak = np.maximum(np.maximum.accumulate(curve, axis=1), peak[:, None])
+        drawdown = np.maximum(drawdown, (running_peak - curve).max(axis=1))
+        peak = running_peak[:, -1]
+        equity = curve[:, -1]
+        traded += trades.sum(axis=1)
+        exposure += np.abs(pos).sum(axis=1)
+        active += (pos != 0).sum(axis=1)
+
+        chunk_days = day[lo:hi]
+        starts = np.flatnonzero(np.concatenate([[True], chunk_days[1:] != chunk_days[:-1]]))
+        daily[:, chunk_days[starts] - first_day] += np.add.reduceat(pnl, starts, axis=1)
+
+    traded_days = np.unique(day - first_day) if n else np.array([], dtype=np.int64)
+    per_day = daily[:, traded_days]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sharpe = per_day.mean(axis=1) / per_day.std(axis=1, ddof=1) * np.sqrt(365)
+    metrics = params.copy()
+    metrics['total_return'] = equity
+    metrics['sharpe'] = sharpe
+    metrics['max_drawdown'] = drawdown
+    metrics['turnover_per_day'] = traded / max(len(traded_days), 1)
+    metrics['exposure'] = exposure / max(n, 1)
+    metrics['time_in_market'] = active / max(n, 1)
+    index = from_minutes((traded_days + first_day) * MINUTES_PER_DAY)
+    return BacktestResult(metrics, pd.DataFrame(per_day.T, index=index, columns=params.index))
@@ -0,0 +1,188 @@
+"""Benchmark harness for the load -> feature -> fit -> score pipeline.
+
+Runs every stage on :mod:`synthetic` candles, both the notebook's pandas
+implementation and the kernels that replace it, under a :func:`profiling.trace`:
+wall time, CPU time, peak traced memory and rows/sec per stage go to a JSON
+file in the trace layout, so runs and ``cli.py --trace`` files compare alike:
+
+    python bench.py --months 12 --symbols 1 --output bench-main.json
+    python bench.py --months 12 --symbols 1 --output bench-branch.json --compare bench-main.json
+
+Sizes go from a fraction of a month up to 10 years (``--months 120``) and 1
+to 500 symbols; with several symbols the panel stages run as well.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from features import FeatureSpec, build_features, feature_matrix
+from panel import Panel, fit_panel, panel_features
+from profiling import compare, load_trace, stage, summary, trace
+from regression import Regression, design_matrix
+from store import CandleStore, convert_pickle
+from synthetic import synthetic_candles
+
+
+def _notebook_stages(d: pd.DataFrame) -> pd.DataFrame:
+    # The notebook's feature cell, split into the stages it spends time in.
+    n = len(d)
+    with stage('features.pandas.copy', n):
+        data = d.copy()
+
+    with stage('features.pandas.returns', n):
+        data['c-o'] = data['close'] - data['open']
+        data['h-l'] = data['high'] - data['low']
+        data['open returns'] = data['open'].pct_change()
+        data['high returns'] = data['high'].pct_change()
+        data['open returns'] = data['low'].pct_change()
+        data['close returns'] = data['close'].pct_change()
+        data['vwap returns'] = data['vwap'].pct_change()
+
+    with stage('features.pandas.rolling', n):
+        for w in (5, 15, 30, 60):
+            data[f'MA{w}'] = data['close returns'].rolling(w).mean()
+
+    with stage('features.pandas.shift', n):
+        for k in (5, 15, 30, 60):
+            data[f'{k} min returns'] = data.close / data.shift(k).close - 1
+        data['VolCount'] = data['volume'] / data['count']
+
+    with stage('features.pandas.sessions', n):
+        data['day'] = data.index.dayofweek
+        data['weekend'] = 0
+        data.loc[data['day'] > 4, 'weekend'] = 1
+        london = np.zeros(n, dtype=np.int64)
+        asia = np.zeros(n, dtype=np.int64)
+        london[data.index.indexer_between_time('07:00:00', '13:30:00')] = 1
+        asia[data.index.indexer_between_time('21:00:00', '23:59:00')] = 1
+        asia[data.index.indexer_between_time('00:00:00', '07:00:00')] = 1
+        data['London'] = london
+        data['Asia'] = asia
+
+    with stage('features.pandas.target', n):
+        data['target'] = data.shift(-15).close / data.close - 1
+
+    with stage('features.pandas.dropna', n):
+        out = data.dropna()
+        out.drop(['open', 'high', 'low', 'close', 'day'], axis=1, inplace=True)
+    return out
+
+
+def _sklearn_models():
+    from sklearn.linear_model import ElasticNet, Lasso, LinearRegression, Ridge
+
+    return {
+        'LinearRegression': LinearRegression(),
+        'Ridge': Ridge(alpha=1.0),
+        'Lasso': Lasso(alpha=1e-5),
+        'ElasticNet': ElasticNet(alpha=1e-5, l1_ratio=0.5),
+    }
+
+
+def run(months: float = 1, symbols: int = 1, memory: bool = True, sklearn: bool = True,
+        workdir: str | None = None) -> dict:
+    """Run every stage once and return its :mod:`profiling` trace, ``{'meta': ..., 'results': [...]}``.
+
+    Top-level stages are the ones listed above; the stages that the library
+    marks itself (``features.build/features.rolling``, ...) are nested in them.
+    """
+    with trace(capture='tracemalloc' if memory else None) as tracer:
+        rows = _run(months, symbols, sklearn, workdir)
+    tracer.meta.update(months=months, symbols=symbols, rows=rows)
+    return tracer.to_json()
+
+
+def _run(months: float, symbols: int, sklearn: bool, workdir: str | None) -> int:
+    candles = synthetic_candles(months, symbols)
+    d = next(iter(candles.values()))
+    n = len(d)
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        pkl = os.path.join(tmp, 'candles.pkl')
+        d.to_pickle(pkl)
+
+        with stage('load.pickle', n):
+            frame = pd.read_pickle(pkl)
+            frame.index = pd.to_datetime(frame.index)
+        with stage('load.store.convert', n):
+            convert_pickle(pkl, os.path.join(tmp, 'store'))
+        store = CandleStore(os.path.join(tmp, 'store'))
+        with stage('load.store', n):
+            store.read()
+        with stage('load.store.close_only', n):
+            store.read(['close'])
+
+        _notebook_stages(d)
+
+        spec = FeatureSpec()
+        arrays = store.read()
+        with stage('features.kernel', n):
+            feature_matrix(arrays, spec)
+        with stage('features.sessions', n):
+            spec.calendar().bits(arrays['minute'])
+        with stage('features.build', n):
+            data = build_features(arrays, spec)
+
+    X, y, _ = design_matrix(data)
+    split = int(len(X) * 0.8)
+    X_train, y_train = X[:split], y[:split]
+    X_test = X[split + spec.target_horizon:]
+
+    if sklearn:
+        from sklearn.preprocessing import StandardScaler
+
+        scaler = StandardScaler()
+        with stage('scale.fit_transform', split):
+            Z_train = scaler.fit_transform(X_train)
+        with stage('scale.transform', len(X_test)):
+            Z_test = scaler.transform(X_test)
+        for name, estimator in _sklearn_models().items():
+            with stage(f'fit.{name}', split):
+                estimator.fit(Z_train, y_train)
+            with stage(f'predict.{name}', len(X_test)):
+                estimator.predict(Z_test)
+
+    reg = Regression()
+    with stage('fit.Regression', split):
+        reg.fit(X_train, y_train)
+    with stage('predict.Regression', len(X_test)):
+        reg.predict_all(X_test)
+
+    if symbols > 1:
+        rows = n * symbols
+        with stage('panel.align', rows):
+            panel = Panel.from_sources(candles)
+        with stage('panel.features', rows):
+            panel_features(panel, spec)
+        with stage('panel.fit', rows):
+            fit_panel(panel, Regression(models=('ols', 'ridge')), spec)
+    return n
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--months', type=float, default=1, help='history length per symbol (1 to 120)')
+    parser.add_argument('--symbols', type=int, default=1, help='number of symbols (1 to 500)')
+    parser.add_argument('--output', default='bench.json', help='JSON file to write the results to')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc (faster, no peak_bytes)')
+    parser.add_argument('--no-sklearn', action='store_true', help='skip the scikit-learn stages')
+    args = parser.parse_args(argv)
+
+    results = run(args.months, args.symbols, memory=not args.no_memory, sklearn=not args.no_sklearn)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1, default=float)
+
+    print(summary(results).to_string())
+    if args.compare:
+        print(compare(load_trace(args.compare), results).to_string())
+
+
+if __name__ == '__main__':
+    main()
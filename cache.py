@@ -0,0 +1,185 @@
+"""On-disk cache of engineered feature frames.
+
+Every experiment starts from the same 23-column ``data`` frame, so rebuilding
+it from the candles each time is wasted work. Entries are keyed by a hash of
+the :class:`features.FeatureSpec` (MA windows, return horizons, sessions,
+target horizon), the dtype and a cheap fingerprint of the source candles, and
+are stored column by column as ``.npy`` files that are memory-mapped when an
+entry is opened, so a handle stays readable after its entry is evicted. The
+cache is bounded by ``max_bytes``; the least recently used entries are
+evicted first.
+
+    >>> cache = FeatureCache('./feature-cache', max_bytes=4 << 30)
+    >>> features = cache.get_or_build('./eth-usdt-1m')
+    >>> data = features.frame()
+"""
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import FeatureSpec, build_features
+from store import INDEX_COLUMN, META_FILE, from_minutes, read_candles, to_minutes
+
+# Bytes hashed from each end of a pickle when fingerprinting it.
+FINGERPRINT_BYTES = 1 << 20
+# Bytes hashed from the end of each column file of a store.
+FINGERPRINT_SAMPLE_BYTES = 1 << 12
+
+
+def fingerprint(path: str) -> str:
+    """Cheap content fingerprint of a candle pickle or store directory.
+
+    Size and mtime plus the first and last MB of a pickle. For a store, its
+    ``meta.json`` (columns, partition ranges and row counts) plus the size,
+    mtime and last 4 KB of every partition's column files, so a store
+    rewritten in place with the same ranges still gets a new fingerprint.
+    """
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        with open(os.path.join(path, META_FILE), 'rb') as f:
+            meta = f.read()
+        digest.update(meta)
+        meta = json.loads(meta)
+        for partition in meta['partitions']:
+            for column in [INDEX_COLUMN, *meta['columns']]:
+                _digest_file(digest, os.path.join(path, partition['key'], column + '.npy'), 0,
+                             FINGERPRINT_SAMPLE_BYTES)
+    else:
+        _digest_file(digest, path, FINGERPRINT_BYTES, FINGERPRINT_BYTES)
+    return digest.hexdigest()
+
+
+def _digest_file(digest, path: str, head: int, tail: int) -> None:
+    # Size and mtime, then the first ``head`` and last ``tail`` bytes.
+    stat = os.stat(path)
+    digest.update(f'{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(head))
+        f.seek(max(stat.st_size - tail, 0))
+        digest.update(f.read(tail))
+
+
+def feature_key(spec: FeatureSpec, source_fingerprint: str, dtype=np.float64) -> str:
+    """Cache key for ``spec`` applied to the source with ``source_fingerprint``."""
+    payload = {'spec': dataclasses.asdict(spec), 'dtype': np.dtype(dtype).str, 'source': source_fingerprint}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:32]
+
+
+class CachedFeatures:
+    """A cache entry; every column is memory-mapped when it is opened.
+
+    Mapping up front is cheap (no data is read) and keeps the columns valid
+    if the entry's files are evicted or replaced later.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.columns = self.meta['columns']
+        self._arrays = {name: np.load(self._file(name), mmap_mode='r') for name in self.meta['files']}
+
+    def __len__(self) -> int:
+        return self.meta['rows']
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, f'{self.meta["files"][name]}.npy')
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._arrays[name]
+
+    @property
+    def minutes(self) -> np.ndarray:
+        return self[INDEX_COLUMN]
+
+    def frame(self, columns=None) -> pd.DataFrame:
+        """The cached ``data`` frame, restricted to ``columns`` if given."""
+        columns = self.columns if columns is None else list(columns)
+        return pd.DataFrame({c: self[c] for c in columns}, index=from_minutes(self.minutes), copy=False)
+
+
+class FeatureCache:
+    """Size-bounded LRU directory of :class:`CachedFeatures` entries."""
+
+    def __init__(self, root: str, max_bytes: int = 2 << 30):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def keys(self) -> list:
+        return [k for k in os.listdir(self.root)
+                if not k.startswith('.') and os.path.isfile(os.path.join(self.root, k, META_FILE))]
+
+    def entry_bytes(self, key: str) -> int:
+        path = self._entry(key)
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+    def size(self) -> int:
+        return sum(self.entry_bytes(k) for k in self.keys())
+
+    def _touch(self, key: str) -> None:
+        # The meta file's mtime doubles as the entry's last-access time.
+        os.utime(os.path.join(self._entry(key), META_FILE))
+
+    def get(self, key: str) -> CachedFeatures | None:
+        if not os.path.isfile(os.path.join(self._entry(key), META_FILE)):
+            return None
+        self._touch(key)
+        return CachedFeatures(self._entry(key))
+
+    def put(self, key: str, frame: pd.DataFrame) -> CachedFeatures:
+        """Store a feature frame under ``key`` and evict older entries if over budget."""
+        tmp = self._entry(f'.{key}.{os.getpid()}.{time.monotonic_ns()}')
+        os.makedirs(tmp)
+        files = {INDEX_COLUMN: INDEX_COLUMN}
+        np.save(os.path.join(tmp, INDEX_COLUMN + '.npy'), to_minutes(frame.index))
+        for j, name in enumerate(frame.columns):
+            # Column names like '5 min returns' are not safe file names.
+            files[name] = f'c{j:03d}'
+            np.save(os.path.join(tmp, files[name] + '.npy'), frame[name].to_numpy())
+        meta = {'columns': list(frame.columns), 'files': files, 'rows': len(frame)}
+        with open(os.path.join(tmp, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=1)
+
+        target = self._entry(key)
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        os.replace(tmp, target)
+        self.evict(keep=key)
+        return CachedFeatures(target)
+
+    def evict(self, keep: str | None = None) -> list:
+        """Drop least recently used entries until the cache fits ``max_bytes``."""
+        entries = sorted(self.keys(), key=lambda k: os.path.getmtime(os.path.join(self._entry(k), META_FILE)))
+        sizes = {k: self.entry_bytes(k) for k in entries}
+        total = sum(sizes.values())
+        evicted = []
+        for key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._entry(key))
+            total -= sizes[key]
+            evicted.append(key)
+        return evicted
+
+    def get_or_build(self, source: str, spec: FeatureSpec | None = None, dtype=np.float64) -> CachedFeatures:
+        """Return cached features for ``source`` (pickle or store), building them on a miss."""
+        spec = spec or FeatureSpec()
+        key = feature_key(spec, fingerprint(source), dtype)
+        cached = self.get(key)
+        if cached is None:
+            cached = self.put(key, build_features(read_candles(source), spec, dtype))
+        return cached
@@ -0,0 +1,126 @@
+"""Command line entry point for the :mod:`pipeline` steps.
+
+    python cli.py features ./eth-usdt-1m --output data.pkl
+    python cli.py train ./eth-usdt-1m ./model --end 2023-01-01
+    python cli.py train ./eth-usdt-1m ./models --horizons 5,15,30,60
+    python cli.py evaluate ./eth-usdt-1m ./model --start 2023-01-01 --backtest
+    python cli.py predict ./eth-usdt-1m ./model --last 60 --output latest.csv
+
+``--trace run.json`` records the per-stage timings of the run (see
+:mod:`profiling`). Results are printed as JSON or plain tables, so the
+commands can run from cron or a shell script without a notebook.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+
+import pipeline
+from features import FeatureSpec
+from profiling import CAPTURES, trace
+
+
+def _ints(text: str) -> tuple:
+    return tuple(int(v) for v in text.split(',') if v)
+
+
+def _spec(args) -> FeatureSpec:
+    default = FeatureSpec()
+    return FeatureSpec(
+        ma_windows=default.ma_windows if args.ma_windows is None else args.ma_windows,
+        return_horizons=default.return_horizons if args.return_horizons is None else args.return_horizons,
+        target_horizon=args.target_horizon,
+    )
+
+
+def _features(args) -> None:
+    frame = pipeline.features(args.source, _spec(args), args.start, args.end, args.output, args.cache_dir)
+    print(json.dumps({'rows': len(frame), 'columns': len(frame.columns), 'dropped': frame.attrs.get('dropped'),
+                      'output': args.output}, default=int))
+
+
+def _train(args) -> None:
+    if args.horizons:
+        predictors, scores = pipeline.train_horizons(args.source, args.horizons, args.model_dir, _spec(args),
+                                                     args.start, args.end, args.holdout, n_jobs=args.jobs)
+        print(scores.to_string(index=False))
+        for h, predictor in predictors.items():
+            print(f'saved {predictor.name} for {h} min to {args.model_dir}/{h}min')
+        return
+    predictor, scores = pipeline.train(args.source, args.model_dir, _spec(args), args.start, args.end, args.holdout,
+                                       model=args.model, alpha=args.alpha)
+    print(scores.to_string(index=False))
+    print(f'saved {predictor.name} to {args.model_dir}')
+
+
+def _evaluate(args) -> None:
+    params = None
+    if args.backtest:
+        from backtest import param_grid
+        params = param_grid()
+    result = pipeline.evaluate(args.source, args.model_dir, args.start, args.end, params)
+    metrics = result.pop('backtest', None)
+    print(json.dumps(result, indent=1))
+    if metrics is not None:
+        print(metrics.to_string(index=False))
+
+
+def _predict(args) -> None:
+    series = pipeline.predict(args.source, args.model_dir, args.start, args.end, args.last, args.output)
+    if args.output is None:
+        print(series.to_string())
+
+
+def parser() -> argparse.ArgumentParser:
+    root = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    root.add_argument('--trace', metavar='PATH', help='write a JSON trace of the stage timings')
+    root.add_argument('--capture', choices=[c for c in CAPTURES if c], help='extra detail recorded with --trace')
+    commands = root.add_subparsers(dest='command', required=True)
+
+    def command(name: str, handler, help: str, model: bool = True) -> argparse.ArgumentParser:
+        sub = commands.add_parser(name, help=help)
+        sub.set_defaults(handler=handler)
+        sub.add_argument('source', help='candle pickle or store directory')
+        if model:
+            sub.add_argument('model_dir', help='model directory (see serve.Predictor)')
+        sub.add_argument('--start', help='first minute to use, e.g. 2022-01-01')
+        sub.add_argument('--end', help='minute to stop before')
+        return sub
+
+    def spec_options(sub: argparse.ArgumentParser) -> None:
+        sub.add_argument('--ma-windows', type=_ints, help='comma separated, default 5,15,30,60')
+        sub.add_argument('--return-horizons', type=_ints, help='comma separated, default 5,15,30,60')
+        sub.add_argument('--target-horizon', type=int, default=FeatureSpec.target_horizon)
+
+    sub = command('features', _features, 'build the feature frame', model=False)
+    spec_options(sub)
+    sub.add_argument('--output', help='.pkl or .csv file to write')
+    sub.add_argument('--cache-dir', help='reuse features through a FeatureCache')
+
+    sub = command('train', _train, 'fit the models and save the best one')
+    spec_options(sub)
+    sub.add_argument('--holdout', type=float, default=0.2, help='trailing share of rows to score on')
+    sub.add_argument('--model', choices=pipeline.MODELS, help='save this model instead of the best')
+    sub.add_argument('--alpha', type=float, help='regularization strength for --model')
+    sub.add_argument('--horizons', type=_ints, help='fit these target horizons together, e.g. 5,15,30,60')
+    sub.add_argument('--jobs', type=int, help='processes for the per-horizon fits (default: all cores)')
+
+    sub = command('evaluate', _evaluate, 'score a saved model')
+    sub.add_argument('--backtest', action='store_true', help='also backtest the predictions')
+
+    sub = command('predict', _predict, 'predict with a saved model')
+    sub.add_argument('--last', type=int, help='only the most recent predictions')
+    sub.add_argument('--output', help='.pkl or .csv file to write')
+    return root
+
+
+def main(argv=None) -> None:
+    args = parser().parse_args(argv)
+    context = trace(args.trace, args.capture) if args.trace else contextlib.nullcontext()
+    with context:
+        args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Opt-in compact dtypes for the feature frame.
+
+:func:`features.build_features` keeps the notebook's dtypes: float64 for every
+feature and int64 for ``count`` and the ``weekend``/session flags. At 2M+ rows
+by 23 columns that is several hundred MB per copy. :func:`compact_frame`
+applies :data:`POLICY` instead:
+
+* float32 for prices, volumes, returns and MAs,
+* uint8 for the binary flags,
+* int32 for ``count``.
+
+Because float32 rounds the features, :func:`validate_compact` refits the
+models on both frames and checks their out-of-sample metrics agree within a
+tolerance, and :func:`memory_report` shows what was saved per column.
+
+Build with ``build_features(candles, dtype=np.float32)`` to skip the float64
+intermediate entirely; :func:`compact_frame` then only narrows the integers.
+
+    >>> small = compact_frame(data)
+    >>> memory_report(data, small)
+    >>> validate_compact(data, small)
+"""
+from __future__ import annotations
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from features import FeatureSpec
+from regression import Regression
+from walkforward import walk_forward
+
+POLICY = {'float': np.float32, 'flag': np.uint8, 'count': np.int32}
+
+
+def column_dtypes(columns, spec: FeatureSpec | None = None) -> dict:
+    """Compact dtype for each feature column under :data:`POLICY`."""
+    spec = spec or FeatureSpec()
+    flags = set(spec.flag_columns)
+    out = {}
+    for name in columns:
+        kind = 'flag' if name in flags else 'count' if name == 'count' else 'float'
+        out[name] = np.dtype(POLICY[kind])
+    return out
+
+
+def compact_frame(data: pd.DataFrame, spec: FeatureSpec | None = None) -> pd.DataFrame:
+    """Return ``data`` downcast to :data:`POLICY`; integer columns must fit exactly."""
+    dtypes = column_dtypes(data.columns, spec)
+    for name, dtype in dtypes.items():
+        if dtype.kind in 'ui' and len(data):
+            values = data[name].to_numpy()
+            info = np.iinfo(dtype)
+            if values.min() < info.min or values.max() > info.max:
+                raise OverflowError(f'{name!r} does not fit in {dtype}: range {values.min()}..{values.max()}')
+    return data.astype(dtypes)
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Bytes per column before and after compaction, with a ``total`` row."""
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'dtype_after': after.dtypes.astype(str),
+        'bytes_before': before.memory_usage(index=False, deep=True),
+        'bytes_after': after.memory_usage(index=False, deep=True),
+    })
+    report.loc['total'] = ['', '', report.bytes_before.sum(), report.bytes_after.sum()]
+    report['saved'] = 1 - report.bytes_after / report.bytes_before
+    return report
+
+
+def validate_compact(data: pd.DataFrame, compact: pd.DataFrame | None = None, model: Regression | None = None,
+                     spec: FeatureSpec | None = None, train_fraction: float = 0.8, rtol: float = 1e-3,
+                     r2_atol: float = 1e-3, strict: bool = True) -> pd.DataFrame:
+    """Fit ``model`` on both frames over one purged time split and compare metrics.
+
+    Returns one row per model/alpha with both sets of metrics. With ``strict``
+    a ValueError is raised if any MSE differs by more than ``rtol`` (relative)
+    or any R^2 by more than ``r2_atol``.
+    """
+    spec = spec or FeatureSpec()
+    compact = compact_frame(data, spec) if compact is None else compact
+    train = int(len(data) * train_fraction)
+    test = len(data) - train - spec.target_horizon
+    kwargs = dict(train=train, test=test, spec=spec, n_jobs=1)
+    full = walk_forward(data, model=model, **kwargs).metrics
+    # Same alpha grid for both fits, so rows compare like with like.
+    model = copy.copy(model or Regression())
+    model.alphas = {m: rows.alpha.to_numpy() for m, rows in full[full.model != 'ols'].groupby('model')}
+    small = walk_forward(compact, model=model, **kwargs).metrics
+
+    report = full[['model', 'alpha', 'mse', 'r2']].copy()
+    report['mse_compact'] = small.mse.to_numpy()
+    report['r2_compact'] = small.r2.to_numpy()
+    report['mse_rel_diff'] = (report.mse_compact - report.mse).abs() / report.mse
+    report['r2_diff'] = (report.r2_compact - report.r2).abs()
+    report['ok'] = (report.mse_rel_diff <= rtol) & (report.r2_diff <= r2_atol)
+    if strict and not report.ok.all():
+        bad = report.loc[~report.ok, ['model', 'alpha', 'mse_rel_diff', 'r2_diff']]
+        raise ValueError(f'compact dtypes change model metrics beyond tolerance:\n{bad.to_string(index=False)}')
+    return report
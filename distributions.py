@@ -0,0 +1,205 @@
+"""Batch fitting of return distributions per horizon and trading regime.
+
+The notebook studies return distributions with ``distfit``, one series at a
+time, single-threaded and on all ~2M minutes. :func:`fit_distributions` fits
+every candidate in :data:`DISTRIBUTIONS` to every return series (close, vwap
+and the k-minute returns) within every regime (all minutes, each session, the
+weekend and weekdays) and returns one summary table:
+
+    >>> table = fit_distributions(d, max_samples=200_000, cache_dir='./fit-cache')
+    >>> table[table.best][['series', 'regime', 'distribution', 'rss']]
+
+Fits are ``scipy.stats`` maximum likelihood on returns standardized by their
+median and standard deviation (``loc``/``scale`` are reported on the original
+scale) and are scored like ``distfit``: the residual sum of squares between the
+histogram density and the fitted pdf (on the standardized scale, so scores
+compare across horizons), plus the Kolmogorov-Smirnov statistic, AIC and BIC.
+Series/regime samples are put in shared memory once and the fits run in a
+process pool. With ``max_samples`` each sample is drawn stratified by calendar
+month, so every part of the history is represented in proportion. With
+``cache_dir`` each fit is stored under a hash of its sample and distribution
+and reused on the next run.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import scipy.stats as st
+
+from features import FeatureSpec, candle_arrays, feature_matrix
+from sessions import ASIA, LONDON, US
+from sharedmem import SharedArrays, arrays, attach
+from store import INDEX_COLUMN
+
+DISTRIBUTIONS = ('norm', 't', 'laplace', 'logistic', 'cauchy', 'gennorm', 'dweibull', 'johnsonsu')
+SERIES = ('close returns', 'vwap returns', '5 min returns', '15 min returns', '30 min returns', '60 min returns')
+SESSIONS = (LONDON, ASIA, US)
+BINS = 200
+
+
+def regime_masks(minutes, calendar_flags: dict) -> dict:
+    """``{regime: bool mask}`` for all minutes, every session, weekend and weekday."""
+    masks = {'all': np.ones(len(minutes), dtype=bool)}
+    for name, flag in calendar_flags.items():
+        if name != 'weekend':
+            masks[name] = flag.astype(bool)
+    masks['weekend'] = calendar_flags['weekend'].astype(bool)
+    masks['weekday'] = ~masks['weekend']
+    return masks
+
+
+def stratified_sample(values: np.ndarray, strata: np.ndarray, size: int, rng: np.random.Generator) -> np.ndarray:
+    """Draw ``size`` of ``values`` without replacement, each stratum in proportion to its size."""
+    if size >= len(values):
+        return values
+    order = np.argsort(strata, kind='stable')
+    _, starts, counts = np.unique(strata[order], return_index=True, return_counts=True)
+    # Largest-remainder allocation so the quotas add up to exactly ``size``.
+    quota = counts * size / len(values)
+    take = np.floor(quota).astype(np.int64)
+    take[np.argsort(take - quota)[:size - take.sum()]] += 1
+    picks = [order[lo + rng.choice(n, k, replace=False)] for lo, n, k in zip(starts, counts, take) if k]
+    return values[np.sort(np.concatenate(picks))]
+
+
+def _fit_key(sample: np.ndarray, distribution: str) -> str:
+    digest = hashlib.sha256(np.ascontiguousarray(sample).tobytes())
+    digest.update(f'{distribution}:{BINS}'.encode())
+    return digest.hexdigest()[:32]
+
+
+def fit_one(sample: np.ndarray, distribution: str) -> dict:
+    """Fit ``distribution`` to ``sample`` and score it (see the module docstring)."""
+    x = sample[np.isfinite(sample)]
+    center, spread = float(np.median(x)), float(np.std(x))
+    spread = spread or 1.0
+    z = (x - center) / spread
+    dist = getattr(st, distribution)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        params = dist.fit(z)
+        frozen = dist(*params)
+        density, edges = np.histogram(z, bins=BINS, density=True)
+        middle = (edges[:-1] + edges[1:]) / 2
+        rss = float(np.sum((density - frozen.pdf(middle)) ** 2))
+        loglik = float(np.sum(frozen.logpdf(z)))
+        ks = float(st.kstest(z, frozen.cdf).statistic)
+    k = len(params)
+    shapes, loc, scale = params[:-2], params[-2], params[-1]
+    return {
+        'n': int(len(x)),
+        'params': [float(p) for p in shapes],
+        'loc': center + loc * spread,
+        'scale': scale * spread,
+        'rss': rss,
+        'ks': ks,
+        'loglik': loglik,
+        'aic': 2 * k - 2 * loglik,
+        'bic': k * np.log(len(x)) - 2 * loglik,
+    }
+
+
+def _fit_task(name: str, distribution: str, sample: np.ndarray | None = None) -> dict:
+    # Workers read their sample from shared memory.
+    sample = arrays()[name] if sample is None else sample
+    return fit_one(sample, distribution)
+
+
+class FitCache:
+    """Fitted parameters and scores, one small JSON file per fit."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.root, f'{key}.json')
+
+    def get(self, key: str) -> dict | None:
+        try:
+            with open(self._file(key)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, result: dict) -> None:
+        tmp = self._file(f'.{key}.{os.getpid()}')
+        with open(tmp, 'w') as f:
+            json.dump(result, f)
+        os.replace(tmp, self._file(key))
+
+
+def return_samples(candles, series=SERIES, sessions=SESSIONS, max_samples: int | None = None,
+                   seed: int = 0) -> dict:
+    """``{(series, regime): returns}`` with NaNs removed, optionally subsampled per month."""
+    c = candle_arrays(candles)
+    horizons = tuple(int(s.split()[0]) for s in series if s.endswith(' min returns'))
+    spec = FeatureSpec(ma_windows=(), return_horizons=horizons, sessions=sessions)
+    matrix = feature_matrix(c, spec)
+    columns = spec.columns
+    minutes = np.asarray(c[INDEX_COLUMN])
+    masks = regime_masks(minutes, {name: matrix[:, columns.index(name)] for name in spec.flag_columns})
+    months = minutes.astype('datetime64[m]').astype('datetime64[M]').astype(np.int64)
+    rng = np.random.default_rng(seed)
+
+    samples = {}
+    for name in series:
+        values = matrix[:, columns.index(name)]
+        finite = np.isfinite(values)
+        for regime, mask in masks.items():
+            keep = finite & mask
+            sample = values[keep]
+            if max_samples is not None:
+                sample = stratified_sample(sample, months[keep], max_samples, rng)
+            samples[name, regime] = np.ascontiguousarray(sample)
+    return samples
+
+
+def fit_distributions(candles, distributions=DISTRIBUTIONS, series=SERIES, sessions=SESSIONS,
+                      max_samples: int | None = 200_000, cache_dir: str | None = None, seed: int = 0,
+                      n_jobs: int | None = None) -> pd.DataFrame:
+    """Fit every distribution to every series within every regime; one row per fit.
+
+    ``best`` marks the lowest-RSS distribution of each series/regime and
+    ``rank`` orders them. ``n_jobs=1`` fits in-process.
+    """
+    samples = return_samples(candles, series, sessions, max_samples, seed)
+    cache = FitCache(cache_dir) if cache_dir else None
+    tasks, results = [], {}
+    for (name, regime), sample in samples.items():
+        if len(sample) < 10:
+            continue
+        for distribution in distributions:
+            key = _fit_key(sample, distribution)
+            cached = cache.get(key) if cache else None
+            if cached is not None:
+                results[name, regime, distribution] = cached
+            else:
+                tasks.append((name, regime, distribution, key))
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs == 1 or len(tasks) < 2:
+        fitted = [fit_one(samples[name, regime], distribution) for name, regime, distribution, _ in tasks]
+    else:
+        shared_names = {f'{name}|{regime}': samples[name, regime] for name, regime, _, _ in tasks}
+        with SharedArrays(shared_names) as shared:
+            with ProcessPoolExecutor(min(n_jobs, len(tasks)), initializer=attach, initargs=(shared.layout,)) as pool:
+                fitted = list(pool.map(_fit_task, [f'{n}|{r}' for n, r, _, _ in tasks], [t[2] for t in tasks]))
+    for (name, regime, distribution, key), result in zip(tasks, fitted):
+        results[name, regime, distribution] = result
+        if cache:
+            cache.put(key, result)
+
+    table = pd.DataFrame([{'series': name, 'regime': regime, 'distribution': distribution, **result}
+                          for (name, regime, distribution), result in results.items()])
+    if table.empty:
+        return table
+    table['rank'] = table.groupby(['series', 'regime']).rss.rank(method='first').astype(np.int64)
+    table['best'] = table['rank'] == 1
+    return table.sort_values(['series', 'regime', 'rank'], kind='stable').reset_index(drop=True)
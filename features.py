@@ -0,0 +1,480 @@
+"""Vectorized feature kernel for the 15 minute trend model.
+
+Replaces the notebook's feature cell, which built ~20 columns one at a time on
+a copy of the whole frame (one ``pct_change`` per price, one ``rolling().mean()``
+per MA window and one full-frame ``shift`` per k-minute return). Here the raw
+candle arrays go in and every feature is written straight into a preallocated
+column-major matrix: MAs come from a single cumulative sum of close returns and
+k-minute returns from array offsets.
+
+:func:`build_features` returns exactly the notebook's ``data`` frame;
+:func:`feature_matrix` returns the bare matrix for model code. Instead of the
+notebook's ``dropna()`` plus ``drop()`` (two more full copies),
+:func:`valid_rows` tracks the warm-up/look-ahead margins and a validity mask,
+and :func:`feature_rows` hands out the complete rows as a view.
+:func:`horizon_rows` does the same for a whole list of target horizons at
+once (see :func:`target_matrix`), for multi-target fits.
+
+Two-step expressions run over cache-sized row blocks, so each column costs
+one pass over memory, and each block notes whether its column received a NaN,
+so finding the complete rows needs no second scan of the clean columns.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+
+import numpy as np
+import pandas as pd
+
+from profiling import stage
+from sessions import NOTEBOOK_SESSIONS, SessionCalendar, as_session
+from store import INDEX_COLUMN, from_minutes, to_minutes
+
+# Raw candle columns that survive into the feature frame (OHLC are dropped).
+PASSTHROUGH_COLUMNS = ('vwap', 'volume', 'usd_volume', 'count')
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """Definition of the engineered columns.
+
+    The defaults reproduce the notebook's "1st Draft" feature set.
+    """
+
+    ma_windows: tuple = (5, 15, 30, 60)
+    return_horizons: tuple = (5, 15, 30, 60)
+    target_horizon: int = 15
+    sessions: tuple = NOTEBOOK_SESSIONS
+
+    @property
+    def session_names(self) -> list:
+        return [as_session(s).name for s in self.sessions]
+
+    def calendar(self) -> SessionCalendar:
+        return SessionCalendar(self.sessions)
+
+    @property
+    def flag_columns(self) -> list:
+        return ['weekend'] + self.session_names
+
+    @property
+    def columns(self) -> list:
+        # 'open returns' is computed from the low price: the notebook assigns
+        # that column twice and the second (low) assignment is what it trains on.
+        return (
+            list(PASSTHROUGH_COLUMNS)
+            + ['c-o', 'h-l', 'open returns', 'high returns', 'close returns', 'vwap returns']
+            + [f'MA{w}' for w in self.ma_windows]
+            + [f'{k} min returns' for k in self.return_horizons]
+            + ['VolCount']
+            + self.flag_columns
+            + ['target']
+        )
+
+    @property
+    def warmup(self) -> int:
+        """Leading rows that are NaN by construction."""
+        return max((1,) + tuple(self.ma_windows) + tuple(self.return_horizons))
+
+
+def candle_arrays(candles) -> dict:
+    """Accept the notebook's ``d`` frame or a :meth:`store.CandleStore.read` dict."""
+    if isinstance(candles, pd.DataFrame):
+        arrays = {c: candles[c].to_numpy() for c in candles.columns}
+        arrays[INDEX_COLUMN] = to_minutes(candles.index)
+        return arrays
+    return candles
+
+
+# Row blocks of about this many elements: the operands of a two-step
+# expression like ``x / y - 1`` stay in cache between the steps, so each
+# column costs one pass over memory instead of two or three.
+BLOCK_ELEMENTS = 1 << 15
+
+
+def _blocks(lo: int, hi: int, shape):
+    # (start, stop) of each block of rows in lo:hi for arrays of ``shape``.
+    step = max(BLOCK_ELEMENTS // max(int(np.prod(shape[1:])), 1), 1)
+    return ((i, min(i + step, hi)) for i in range(lo, hi, step))
+
+
+def _has_nan(x: np.ndarray) -> bool:
+    # False only when x holds no NaN; inf - inf in the sum just costs a rescan.
+    return bool(np.isnan(np.add.reduce(x, axis=0)).any())
+
+
+def _pct_change(x: np.ndarray, lag: int, out: np.ndarray) -> bool:
+    # x[t] / x[t - lag] - 1; returns whether any row after the first lag got a NaN.
+    n = len(out)
+    out[:lag] = np.nan
+    nan = False
+    for lo, hi in _blocks(lag, n, out.shape):
+        block = out[lo:hi]
+        np.divide(x[lo:hi], x[lo - lag:hi - lag], out=block)
+        block -= 1
+        nan = nan or _has_nan(block)
+    return nan
+
+
+def _forward_return(close: np.ndarray, h: int, out: np.ndarray) -> bool:
+    # close[t + h] / close[t] - 1, NaN for the last h rows; returns whether
+    # any other row got a NaN.
+    n = len(close)
+    out[max(n - h, 0):] = np.nan
+    nan = False
+    for lo, hi in _blocks(0, n - h, out.shape):
+        block = out[lo:hi]
+        np.divide(close[lo + h:hi + h], close[lo:hi], out=block)
+        block -= 1
+        nan = nan or _has_nan(block)
+    return nan
+
+
+def _assign(x: np.ndarray, out: np.ndarray) -> None:
+    out[...] = x
+
+
+def _apply(fn, out: np.ndarray, *args) -> bool:
+    # fn(*args, out=out) block by block; returns whether out got a NaN.
+    n = len(out)
+    nan = False
+    for lo, hi in _blocks(0, n, out.shape):
+        block = out[lo:hi]
+        fn(*(a[lo:hi] for a in args), out=block)
+        nan = nan or _has_nan(block)
+    return nan
+
+
+def prefix_sums(r: np.ndarray):
+    """Prefix sums of ``r`` (NaN as 0) and of its NaN mask, each with a leading zero row."""
+    # One prefix sum serves every window; the second one over the NaN mask
+    # reproduces rolling().mean()'s "NaN anywhere in the window" rule.
+    shape = (len(r) + 1,) + r.shape[1:]
+    nan = np.isnan(r)
+    csum = np.zeros(shape)
+    np.cumsum(np.where(nan, 0.0, r), axis=0, out=csum[1:])
+    cnan = np.zeros(shape, dtype=np.int64)
+    np.cumsum(nan, axis=0, out=cnan[1:])
+    return csum, cnan
+
+
+def window_mean(csum: np.ndarray, cnan: np.ndarray, w: int, out: np.ndarray, start: int = 0) -> None:
+    """``rolling(w).mean()`` for rows ``start:start + len(out)`` from :func:`prefix_sums`."""
+    stop = start + len(out)
+    lo = min(max(start, w - 1), stop)
+    out[:lo - start] = np.nan
+    out[lo - start:] = (csum[lo + 1:stop + 1] - csum[lo + 1 - w:stop + 1 - w]) / w
+    out[lo - start:][cnan[lo + 1:stop + 1] - cnan[lo + 1 - w:stop + 1 - w] > 0] = np.nan
+
+
+def _rolling_means(r: np.ndarray, windows, outs, nan: bool = True) -> bool:
+    # ``nan``: whether r may hold a NaN besides r[0]. Returns whether the
+    # means may hold one besides their first w rows.
+    if nan or len(r) < 2:
+        csum, cnan = prefix_sums(r)
+        for w, out in zip(windows, outs):
+            window_mean(csum, cnan, w, out)
+        return True
+    # r[0] is the only NaN: the prefix sums of prefix_sums() (same
+    # additions, same order) block by block, without a NaN mask. buf[k]
+    # holds csum[lo + 1 - h + k], the last h sums of the previous block
+    # followed by the sums of this one.
+    n = len(r)
+    h = max(windows, default=1)
+    buf = np.zeros((h + min(n, BLOCK_ELEMENTS),) + r.shape[1:])
+    for lo, hi in _blocks(0, n, buf.shape):
+        sums = buf[h - 1:h + hi - lo]
+        sums[1:] = r[lo:hi]
+        if not lo:
+            sums[1] = 0
+        np.cumsum(sums, axis=0, out=sums)
+        for w, out in zip(windows, outs):
+            a = max(lo, w)
+            if a < hi:
+                out[a:hi] = (buf[a - lo + h:hi - lo + h] - buf[a - lo + h - w:hi - lo + h - w]) / w
+        buf[:h] = buf[hi - lo:hi - lo + h]
+    for w, out in zip(windows, outs):
+        # rolling().mean() is NaN while the window holds r[0].
+        out[:w] = np.nan
+    return False
+
+
+def _fill(c: dict, spec: FeatureSpec, out: dict):
+    # Write every feature of ``spec`` into ``out[name]``; returns per column
+    # whether it may hold a NaN besides the rows that are NaN by construction.
+    # 0/0 VolCount (zero-count and gap-filled minutes) and zero prices are
+    # expected; they become NaN rows that the cleaning step drops.
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return _fill_columns(c, spec, out)
+
+
+def feature_matrix(candles, spec: FeatureSpec | None = None, dtype=np.float64) -> np.ndarray:
+    """Fill an ``(n, len(spec.columns))`` matrix with every feature for every row.
+
+    Rows are aligned with the input candles; warm-up rows and the last
+    ``target_horizon`` rows hold NaN exactly where the notebook's frame did.
+    Candle arrays of shape ``(n, symbols)`` (see :mod:`panel`) give an
+    ``(n, len(spec.columns), symbols)`` result, one column block per feature.
+    """
+    return _feature_matrix(candle_arrays(candles), spec or FeatureSpec(), dtype)[0]
+
+
+def _feature_matrix(c: dict, spec: FeatureSpec, dtype):
+    # (matrix, NaN flags per column), see _fill().
+    columns = spec.columns
+    # Feature-major storage, so every out[:, j] is one contiguous block.
+    out = np.empty((len(columns), len(c['close'])) + np.shape(c['close'])[1:], dtype=dtype).swapaxes(0, 1)
+    return out, _fill(c, spec, {name: out[:, j] for j, name in enumerate(columns)})
+
+
+def _fill_columns(c: dict, spec: FeatureSpec, out: dict) -> dict:
+    # Returns for every column whether it may hold a NaN besides the rows
+    # that are NaN by construction.
+    n = len(c['close'])
+    extra = np.shape(c['close'])[1:]
+    close = np.asarray(c['close'], dtype=np.float64)
+    nan = dict.fromkeys(spec.flag_columns, False)
+
+    with stage('features.passthrough', n):
+        for name in PASSTHROUGH_COLUMNS:
+            nan[name] = _apply(_assign, out[name], np.asarray(c[name]))
+        nan['c-o'] = _apply(np.subtract, out['c-o'], np.asarray(c['close']), np.asarray(c['open']))
+        nan['h-l'] = _apply(np.subtract, out['h-l'], np.asarray(c['high']), np.asarray(c['low']))
+        nan['VolCount'] = _apply(np.divide, out['VolCount'], np.asarray(c['volume']), np.asarray(c['count']))
+
+    with stage('features.returns', n):
+        for name, source in (('open returns', 'low'), ('high returns', 'high'), ('vwap returns', 'vwap')):
+            nan[name] = _pct_change(np.asarray(c[source], dtype=np.float64), 1, out[name])
+        # Close returns feed the MAs in float64 whatever the matrix dtype.
+        returns = out['close returns'] if out['close returns'].dtype == np.float64 else np.empty(close.shape)
+        nan['close returns'] = _pct_change(close, 1, returns)
+        if returns is not out['close returns']:
+            out['close returns'][...] = returns
+
+    with stage('features.rolling', n):
+        means = _rolling_means(returns, spec.ma_windows, [out[f'MA{w}'] for w in spec.ma_windows],
+                               nan['close returns'])
+        nan.update({f'MA{w}': means for w in spec.ma_windows})
+
+    with stage('features.shift', n):
+        for k in spec.return_horizons:
+            nan[f'{k} min returns'] = _pct_change(close, k, out[f'{k} min returns'])
+
+    with stage('features.sessions', n):
+        bits = spec.calendar().bits(c[INDEX_COLUMN]).reshape((n,) + (1,) * len(extra))
+        for b, name in enumerate(spec.flag_columns):
+            # SessionCalendar.unpack(), straight into the flag columns.
+            np.bitwise_and(bits >> b, 1, out=out[name])
+
+    with stage('features.target', n):
+        nan['target'] = _forward_return(close, spec.target_horizon, out['target'])
+
+    return nan
+
+
+def target_columns(horizons) -> list:
+    return [f'{h} min target' for h in horizons]
+
+
+def target_matrix(candles, horizons, dtype=np.float64) -> np.ndarray:
+    """``(n, len(horizons))`` forward close returns, one column per horizon.
+
+    Column ``j`` equals the ``target`` column of :func:`feature_matrix` with
+    ``target_horizon=horizons[j]``.
+    """
+    c = candle_arrays(candles)
+    close = np.asarray(c['close'], dtype=np.float64)
+    n = len(close)
+    out = np.empty((len(horizons), n) + close.shape[1:], dtype=dtype).swapaxes(0, 1)
+    with stage('features.targets', n), np.errstate(invalid='ignore', divide='ignore'):
+        for j, h in enumerate(horizons):
+            _forward_return(close, h, out[:, j])
+    return out
+
+
+@dataclass
+class ValidRows:
+    """Complete rows of a :func:`feature_matrix` and why the others were dropped.
+
+    Rows before ``start`` (MA/return warm-up) and from ``stop`` on (target
+    look-ahead) are incomplete by construction; ``valid`` marks the complete
+    rows in between. ``dropped`` counts rows per cause: ``warmup``,
+    ``lookahead``, ``gap fill`` (minutes added by :func:`gaps.resample`),
+    ``gap window`` (real rows whose look-back window or target reaches one
+    of those minutes), ``zero count`` (0/0 in VolCount) and ``NaN <column>`` for any other gap in
+    the data, charged to the first NaN column of the row.
+    """
+
+    valid: np.ndarray
+    start: int
+    stop: int
+    dropped: dict
+
+    @property
+    def n_valid(self) -> int:
+        return len(self.valid) - sum(self.dropped.values())
+
+    @property
+    def contiguous(self) -> bool:
+        """True when the valid rows are exactly ``start:stop``."""
+        return self.n_valid == self.stop - self.start
+
+    def segments(self) -> list:
+        """``(lo, hi)`` bounds of every run of consecutive valid rows."""
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], self.valid.view(np.int8), [0]])))
+        return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+    def view(self, matrix: np.ndarray) -> np.ndarray:
+        """The valid rows of ``matrix`` without copying it.
+
+        Normally just ``matrix[start:stop]``. If gaps left NaN rows in between,
+        the valid runs are first shifted down over them in place, so
+        ``matrix`` itself is overwritten.
+        """
+        if self.contiguous:
+            return matrix[self.start:self.stop]
+        end = 0
+        for lo, hi in self.segments():
+            if lo != end:
+                matrix[end:end + hi - lo] = matrix[lo:hi]
+            end += hi - lo
+        return matrix[:end]
+
+    def report(self) -> pd.DataFrame:
+        """Dropped rows per cause plus the ``kept`` rows, with their share of all rows."""
+        report = pd.DataFrame({'rows': pd.Series(self.dropped, dtype=np.int64)})
+        report.loc['kept'] = self.n_valid
+        report['share'] = report.rows / max(len(self.valid), 1)
+        return report
+
+
+def valid_rows(matrix: np.ndarray, spec: FeatureSpec | None = None) -> ValidRows:
+    """Find the complete rows of a :func:`feature_matrix` result built with ``spec``.
+
+    Only the rows between the warm-up and look-ahead margins are scanned, one
+    column at a time, instead of materializing ``np.isnan(matrix)``; a column
+    whose sum is not NaN holds no NaN and needs no mask.
+    """
+    spec = spec or FeatureSpec()
+    return _valid_rows(_columns(matrix, spec), len(matrix), spec)
+
+
+def _columns(matrix: np.ndarray, spec: FeatureSpec) -> dict:
+    return {name: matrix[:, j] for j, name in enumerate(spec.columns)}
+
+
+def _valid_rows(columns: dict, n: int, spec: FeatureSpec, nan: dict | None = None,
+                observed: np.ndarray | None = None) -> ValidRows:
+    # With the NaN flags of _fill(), columns without any are not even read.
+    # Rows not ``observed`` (filled in by gaps.resample) go first, so they
+    # are never charged to the zero count or NaN causes of real candles.
+    start = min(spec.warmup, n)
+    stop = max(n - spec.target_horizon, start)
+    valid = np.zeros(n, dtype=bool)
+    inner = valid[start:stop]
+    dropped = {'warmup': start, 'lookahead': n - stop}
+    if observed is None:
+        inner[:] = True
+    else:
+        inner[:] = observed[start:stop]
+        count = len(inner) - int(np.count_nonzero(inner))
+        if count:
+            dropped['gap fill'] = count
+        if start < stop and not observed.all():
+            # Filled minutes in each real row's window, rows i - warmup
+            # through i + target_horizon (its look-back and its target).
+            h, w = spec.target_horizon, spec.warmup
+            filled = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(~observed, out=filled[1:])
+            near = filled[start + h + 1:stop + h + 1] > filled[start - w:stop - w]
+            near &= inner
+            count = int(np.count_nonzero(near))
+            if count:
+                dropped['gap window'] = count
+                inner &= ~near
+    for name in spec.columns:
+        column = columns[name][start:stop]
+        if not (nan[name] if nan is not None else np.isnan(np.add.reduce(column))):
+            continue
+        bad = np.isnan(column)
+        bad &= inner
+        count = int(np.count_nonzero(bad))
+        if count:
+            cause = 'zero count' if name == 'VolCount' else f'NaN {name}'
+            dropped[cause] = dropped.get(cause, 0) + count
+            inner &= ~bad
+    return ValidRows(valid, start, stop, dropped)
+
+
+def feature_rows(candles, spec: FeatureSpec | None = None, dtype=np.float64):
+    """``(minutes, matrix, rows)``: the complete feature rows as a view, and their :class:`ValidRows`.
+
+    ``matrix[:, :-1]`` and ``matrix[:, -1]`` are zero-copy ``X``/``y`` views
+    for the models.
+    """
+    spec = spec or FeatureSpec()
+    c = candle_arrays(candles)
+    matrix, nan = _feature_matrix(c, spec, dtype)
+    with stage('clean', len(matrix)):
+        rows = _valid_rows(_columns(matrix, spec), len(matrix), spec, nan)
+        minutes = np.asarray(c[INDEX_COLUMN])
+        minutes = minutes[rows.start:rows.stop] if rows.contiguous else minutes[rows.valid]
+        return minutes, rows.view(matrix), rows
+
+
+def horizon_rows(candles, horizons, spec: FeatureSpec | None = None, dtype=np.float64):
+    """``(minutes, X, Y, rows)``: the complete feature rows and their targets at every horizon.
+
+    One :func:`feature_matrix` pass (with the longest horizon as its target,
+    so the look-ahead margin covers all of them) and one
+    :func:`target_matrix` pass; a row is kept when its features and every
+    target are finite. ``X`` and ``Y`` are views like in :func:`feature_rows`.
+    """
+    horizons = tuple(horizons)
+    spec = replace(spec or FeatureSpec(), target_horizon=max(horizons))
+    c = candle_arrays(candles)
+    matrix, nan = _feature_matrix(c, spec, dtype)
+    targets = target_matrix(c, horizons, dtype)
+    with stage('clean', len(matrix)):
+        rows = _valid_rows(_columns(matrix, spec), len(matrix), spec, nan)
+        if 'NaN target' in rows.dropped:
+            rows.dropped[f'NaN {target_columns([spec.target_horizon])[0]}'] = rows.dropped.pop('NaN target')
+        inner = rows.valid[rows.start:rows.stop]
+        for j, name in enumerate(target_columns(horizons)):
+            bad = np.isnan(targets[rows.start:rows.stop, j])
+            bad &= inner
+            count = int(np.count_nonzero(bad))
+            if count:
+                rows.dropped[f'NaN {name}'] = count
+                inner &= ~bad
+        minutes = np.asarray(c[INDEX_COLUMN])
+        minutes = minutes[rows.start:rows.stop] if rows.contiguous else minutes[rows.valid]
+        return minutes, rows.view(matrix)[:, :-1], rows.view(targets), rows
+
+
+def build_features(candles, spec: FeatureSpec | None = None, dtype=np.float64) -> pd.DataFrame:
+    """Return the notebook's ``data`` frame: all features, NaN rows dropped, OHLC removed.
+
+    The frame wraps the valid rows of the feature columns without copying
+    them; ``frame.attrs['dropped']`` holds :attr:`ValidRows.dropped`. Minutes
+    that :func:`gaps.resample` filled in (``observed`` False) are dropped as
+    ``gap fill``, and real rows whose windows or target reach them as
+    ``gap window``.
+    """
+    spec = spec or FeatureSpec()
+    c = candle_arrays(candles)
+    n = len(c['close'])
+    # One array per column, so the int columns are written as ints rather
+    # than cast out of a feature_matrix() afterwards.
+    kinds = dict.fromkeys(spec.columns, dtype)
+    kinds.update({'count': np.asarray(c['count']).dtype, **dict.fromkeys(spec.flag_columns, np.int64)})
+    out = {name: np.empty(n, dtype=kind) for name, kind in kinds.items()}
+    nan = _fill(c, spec, out)
+    with stage('clean', n):
+        rows = _valid_rows(out, n, spec, nan, c.get('observed'))
+        minutes = np.asarray(c[INDEX_COLUMN])
+        minutes = minutes[rows.start:rows.stop] if rows.contiguous else minutes[rows.valid]
+    with stage('features.frame', len(minutes)):
+        frame = pd.DataFrame({name: rows.view(out[name]) for name in spec.columns}, index=from_minutes(minutes),
+                             copy=False)
+    frame.attrs['dropped'] = rows.dropped
+    return frame
@@ -0,0 +1,155 @@
+"""Incremental feature engine for live minute-by-minute prediction.
+
+Re-running :func:`features.build_features` over four years of history for
+every new candle is far too slow for a live loop. :class:`FeatureEngine` keeps
+just enough state to emit the next feature row in constant time:
+
+* the last ``warmup + 1`` closes, for the k-minute returns and the target,
+* the last ``max(ma_windows)`` close returns plus a running sum per MA window,
+* the previous low/high/vwap for the one-minute returns,
+* the session calendar's flags for the current hour.
+
+    >>> engine = FeatureEngine.from_history(d)
+    >>> row = engine.update(minute, open, high, low, close, vwap, volume, usd_volume, count)
+
+``row`` matches the batch row for the same minute except ``target``, which is
+not known yet; once ``target_horizon`` more minutes arrive the completed row
+is available as :attr:`FeatureEngine.labelled`.
+"""
+from __future__ import annotations
+
+import math
+from collections import deque
+
+import numpy as np
+
+from features import PASSTHROUGH_COLUMNS, FeatureSpec, candle_arrays
+from store import CANDLE_COLUMNS, INDEX_COLUMN
+
+NAN = float('nan')
+
+
+def _ratio(a: float, b: float) -> float:
+    # Python float division with NumPy's semantics for a zero denominator.
+    if b:
+        return a / b
+    if a == 0 or a != a or b != b:
+        return NAN
+    return math.copysign(math.inf, a)
+
+
+def _change(new: float, old: float) -> float:
+    return _ratio(new, old) - 1
+
+
+class FeatureEngine:
+    """Stateful, append-only equivalent of :func:`features.feature_matrix`."""
+
+    def __init__(self, spec: FeatureSpec | None = None):
+        self.spec = spec or FeatureSpec()
+        self.columns = self.spec.columns
+        self._max_window = max(self.spec.ma_windows, default=1)
+        self._closes = deque(maxlen=max(self.spec.warmup, self.spec.target_horizon) + 1)
+        self._returns = deque(maxlen=self._max_window)
+        self._sums = dict.fromkeys(self.spec.ma_windows, 0.0)
+        self._nans = dict.fromkeys(self.spec.ma_windows, 0)
+        self._since_resum = 0
+        self._prev = None
+        self._pending = deque(maxlen=self.spec.target_horizon)
+        self._calendar = self.spec.calendar()
+        self._hour = None
+        self._hour_flags = None
+        self.labelled = None
+
+    @classmethod
+    def from_history(cls, candles, spec: FeatureSpec | None = None) -> 'FeatureEngine':
+        """Seed the engine from the tail of a historical candle frame or store read."""
+        engine = cls(spec)
+        c = candle_arrays(candles)
+        n = len(c['close'])
+        tail = max(engine.spec.warmup, engine.spec.target_horizon) + engine.spec.target_horizon
+        engine.update_many({k: np.asarray(v)[max(n - tail, 0):] for k, v in c.items()})
+        return engine
+
+    def _push_return(self, r: float) -> None:
+        returns = self._returns
+        full = len(returns)
+        for w in self._sums:
+            if full >= w:
+                old = returns[-w]
+                if old != old:
+                    self._nans[w] -= 1
+                else:
+                    self._sums[w] -= old
+            if r != r:
+                self._nans[w] += 1
+            else:
+                self._sums[w] += r
+        returns.append(r)
+        # Re-sum from the buffer once per cycle so add/subtract drift stays bounded.
+        self._since_resum += 1
+        if self._since_resum >= self._max_window:
+            self._since_resum = 0
+            values = list(returns)
+            for w in self._sums:
+                window = [v for v in values[-w:] if v == v]
+                self._sums[w] = math.fsum(window)
+
+    def _flags(self, minute: int) -> list:
+        # Calendar flags are resolved a whole hour at a time.
+        hour = minute // 60
+        if hour != self._hour:
+            bits = self._calendar.bits(np.arange(hour * 60, hour * 60 + 60))
+            self._hour_flags = np.column_stack(list(self._calendar.unpack(bits).values())).astype(float).tolist()
+            self._hour = hour
+        return self._hour_flags[minute % 60]
+
+    def update(self, minute, open, high, low, close, vwap, volume, usd_volume, count) -> np.ndarray:
+        """Add one candle and return its feature row (``target`` is NaN)."""
+        spec = self.spec
+        minute = int(minute)
+        prev = self._prev
+        closes = self._closes
+
+        r = _change(close, closes[-1]) if closes else NAN
+        self._push_return(r)
+        closes.append(close)
+
+        values = {'vwap': vwap, 'volume': volume, 'usd_volume': usd_volume, 'count': count}
+        row = [float(values[name]) for name in PASSTHROUGH_COLUMNS]
+        row += [
+            close - open,
+            high - low,
+            _change(low, prev[0]) if prev else NAN,
+            _change(high, prev[1]) if prev else NAN,
+            r,
+            _change(vwap, prev[2]) if prev else NAN,
+        ]
+        seen = len(self._returns)
+        for w in spec.ma_windows:
+            row.append(self._sums[w] / w if seen >= w and not self._nans[w] else NAN)
+        for k in spec.return_horizons:
+            row.append(_change(close, closes[-k - 1]) if len(closes) > k else NAN)
+        row.append(_ratio(volume, count))
+        row += self._flags(minute)
+        row.append(NAN)
+        self._prev = (low, high, vwap)
+
+        out = np.array(row)
+        self.labelled = None
+        pending = self._pending
+        if pending.maxlen and len(pending) == pending.maxlen:
+            then, then_close, then_row = pending[0]
+            then_row = then_row.copy()
+            then_row[-1] = _change(close, then_close)
+            self.labelled = (then, then_row)
+        if pending.maxlen:
+            pending.append((minute, close, out))
+        return out
+
+    def update_many(self, candles) -> np.ndarray:
+        """Feed a small batch of candles in order and return their feature rows."""
+        c = candle_arrays(candles)
+        columns = [np.asarray(c[INDEX_COLUMN]).tolist()] + [np.asarray(c[name]).tolist() for name in CANDLE_COLUMNS]
+        rows = [self.update(*candle) for candle in zip(*columns)]
+        return np.vstack(rows) if rows else np.empty((0, len(self.columns)))
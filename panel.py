@@ -0,0 +1,204 @@
+"""Multi-symbol panel mode: one feature pass and one model batch for many pairs.
+
+The notebook is wired to a single ``binance-eth-usdt-spot-1m`` frame. A
+:class:`Panel` holds the candles of N symbols as aligned ``(time, symbol)``
+arrays on the union of their minutes (missing minutes are NaN), so
+:func:`features.feature_matrix` computes every feature for every symbol in one
+vectorized pass. Per-symbol sufficient statistics are accumulated for all
+symbols at once by :class:`PanelStats`; the per-symbol fits then only touch
+small ``(features x features)`` matrices.
+
+    >>> panel = Panel.from_sources({'ETHUSDT': './eth-usdt-1m', 'BTCUSDT': './btc-usdt-1m'})
+    >>> result = fit_panel(panel)
+    >>> result.metrics.sort_values('r2')
+
+The feature tensor takes ``time x features x symbols`` floats, so choose the
+date range accordingly for hundreds of pairs.
+"""
+from __future__ import annotations
+
+import copy
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from features import FeatureSpec, candle_arrays, feature_matrix
+from regression import GramStats, Regression
+from store import CANDLE_COLUMNS, INDEX_COLUMN, read_candles
+
+# Time steps per block when accumulating statistics and scores.
+CHUNK_MINUTES = 1 << 14
+
+
+@dataclass
+class Panel:
+    """Candles of several symbols aligned on one minute axis."""
+
+    minutes: np.ndarray
+    symbols: list
+    candles: dict
+
+    @classmethod
+    def from_sources(cls, sources: dict, start=None, end=None) -> 'Panel':
+        """Align ``{symbol: store path | pickle path | candle frame | array dict}``."""
+        arrays = {}
+        for symbol, source in sources.items():
+            arrays[symbol] = read_candles(source, CANDLE_COLUMNS, start, end) if isinstance(source, str) else candle_arrays(source)
+        minutes = np.unique(np.concatenate([np.asarray(a[INDEX_COLUMN]) for a in arrays.values()]))
+        candles = {c: np.full((len(minutes), len(arrays)), np.nan) for c in CANDLE_COLUMNS}
+        for i, a in enumerate(arrays.values()):
+            rows = np.searchsorted(minutes, a[INDEX_COLUMN])
+            for c in CANDLE_COLUMNS:
+                candles[c][rows, i] = a[c]
+        return cls(minutes, list(arrays), candles)
+
+    def arrays(self) -> dict:
+        """Candle arrays in the shape :func:`features.feature_matrix` expects."""
+        return dict(self.candles, **{INDEX_COLUMN: self.minutes})
+
+
+def panel_features(panel: Panel, spec: FeatureSpec | None = None, dtype=np.float64) -> np.ndarray:
+    """``(time, feature, symbol)`` tensor of every feature for every symbol."""
+    return feature_matrix(panel.arrays(), spec, dtype)
+
+
+class PanelStats:
+    """:class:`regression.GramStats` for every symbol at once.
+
+    ``n`` is ``(symbols,)``, ``mean`` ``(symbols, p + 1)`` and ``comoment``
+    ``(symbols, p + 1, p + 1)``; rows with any NaN are skipped per symbol.
+    """
+
+    def __init__(self, n_symbols: int, n_features: int):
+        self.n_features = n_features
+        self.n = np.zeros(n_symbols, dtype=np.int64)
+        self.mean = np.zeros((n_symbols, n_features + 1))
+        self.comoment = np.zeros((n_symbols, n_features + 1, n_features + 1))
+
+    def update(self, Z: np.ndarray) -> 'PanelStats':
+        """Fold a ``(time, p + 1, symbol)`` block of ``[X | y]`` rows into the statistics."""
+        Z = np.asarray(Z, dtype=np.float64)
+        valid = ~np.isnan(Z).any(axis=1)
+        n = valid.sum(axis=0)
+        Z = np.where(valid[:, None, :], Z, 0.0)
+        mean = Z.sum(axis=0).T / np.maximum(n, 1)[:, None]
+        Z = np.where(valid[:, None, :], Z - mean.T[None], 0.0)
+        comoment = np.einsum('tpn,tqn->npq', Z, Z, optimize=True)
+
+        total = self.n + n
+        weight = np.divide(n, total, out=np.zeros(len(n)), where=total > 0)
+        delta = mean - self.mean
+        self.comoment += comoment + np.einsum('np,nq->npq', delta, delta) * (self.n * weight)[:, None, None]
+        self.mean += delta * weight[:, None]
+        self.n = total
+        return self
+
+    def gram(self, i: int) -> GramStats:
+        stats = GramStats(self.n_features)
+        stats.n, stats.mean, stats.comoment = int(self.n[i]), self.mean[i].copy(), self.comoment[i].copy()
+        return stats
+
+
+@dataclass
+class PanelResult:
+    """Per-symbol fitted models, stacked coefficients and the metrics table.
+
+    ``coef`` is ``(symbols, models, features)`` and ``intercept``
+    ``(symbols, models)``; ``labels[i]`` names symbol i's models.
+    """
+
+    symbols: list
+    models: dict
+    labels: list
+    coef: np.ndarray
+    intercept: np.ndarray
+    metrics: pd.DataFrame
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """``(time, symbol, model)`` predictions for a ``(time, feature, symbol)`` block."""
+        return np.einsum('tpn,nmp->tnm', X, self.coef, optimize=True) + self.intercept
+
+
+def _split(tensor, j, rows):
+    features = [i for i in range(tensor.shape[1]) if i != j]
+    block = tensor[rows]
+    return block[:, features], block[:, j]
+
+
+def _shared_alphas(model: Regression, grams: list) -> dict:
+    # One grid per model for every symbol, so their coefficients stack.
+    # Automatic L1 grids start where every symbol's path is all zero.
+    grids = [model.alpha_grids(gram) for gram in grams]
+    return {name: max((grid[name] for grid in grids), key=lambda alphas: alphas[0]) for name in grids[0]}
+
+
+def fit_panel(panel: Panel, model: Regression | None = None, spec: FeatureSpec | None = None,
+              target: str = 'target', train_fraction: float = 0.8, dtype=np.float64) -> PanelResult:
+    """Fit one :class:`regression.Regression` per symbol and score it out of sample.
+
+    The first ``train_fraction`` of the minute axis trains every symbol; the
+    rest, after a ``target_horizon`` purge gap, is used for the metrics.
+    All symbols share one alpha grid per model. A symbol with no more
+    complete training rows than features is skipped: its model is None and
+    its coefficients, intercepts and metrics are NaN.
+    """
+    spec = spec or FeatureSpec()
+    model = model or Regression()
+    tensor = panel_features(panel, spec, dtype)
+    columns = spec.columns
+    j = columns.index(target)
+    order = [i for i in range(len(columns)) if i != j] + [j]
+    split = int(len(panel.minutes) * train_fraction)
+
+    stats = PanelStats(len(panel.symbols), len(columns) - 1)
+    for lo in range(0, split, CHUNK_MINUTES):
+        stats.update(tensor[lo:min(lo + CHUNK_MINUTES, split)][:, order])
+
+    # Symbols without more complete training rows than features (e.g. pairs
+    # listed late in the range) cannot be fitted; they keep NaN coefficients.
+    fit = [i for i in range(len(panel.symbols)) if stats.n[i] > stats.n_features]
+    if not fit:
+        raise ValueError('no symbol has more complete training rows than features')
+    grids = _shared_alphas(model, [stats.gram(i) for i in fit])
+    labels = [('ols', 0.0)] * ('ols' in model.models)
+    labels += [(name, float(alpha)) for name, alphas in grids.items() for alpha in alphas]
+    coef = np.full((len(panel.symbols), len(labels), stats.n_features), np.nan)
+    intercept = np.full((len(panel.symbols), len(labels)), np.nan)
+    models = dict.fromkeys(panel.symbols)
+    for i in fit:
+        fitted = copy.copy(model)
+        fitted.alphas = grids
+        fitted.feature_names_ = [columns[k] for k in order[:-1]]
+        fitted.fit_stats(stats.gram(i))
+        models[panel.symbols[i]] = fitted
+        coef[i], intercept[i] = fitted.coef_, fitted.intercept_
+    labels = [labels] * len(panel.symbols)
+
+    # Out-of-sample SSE and target moments, accumulated per symbol and model.
+    n_models = coef.shape[1]
+    n = np.zeros(len(panel.symbols))
+    sse = np.zeros((len(panel.symbols), n_models))
+    ysum = np.zeros(len(panel.symbols))
+    ysq = np.zeros(len(panel.symbols))
+    for lo in range(split + spec.target_horizon, len(panel.minutes), CHUNK_MINUTES):
+        X, y = _split(tensor, j, slice(lo, lo + CHUNK_MINUTES))
+        valid = ~(np.isnan(X).any(axis=1) | np.isnan(y))
+        X = np.where(valid[:, None, :], X, 0.0)
+        y = np.where(valid, y, 0.0)
+        pred = np.einsum('tpn,nmp->tnm', X, coef, optimize=True) + intercept
+        sse += (((pred - y[:, :, None]) ** 2) * valid[:, :, None]).sum(axis=0)
+        n += valid.sum(axis=0)
+        ysum += y.sum(axis=0)
+        ysq += (y ** 2).sum(axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mse = sse / n[:, None]
+        sst = ysq - ysum ** 2 / n
+        r2 = 1 - sse / sst[:, None]
+    rows = []
+    for i, symbol in enumerate(panel.symbols):
+        for m, (name, alpha) in enumerate(labels[i]):
+            rows.append({'symbol': symbol, 'model': name, 'alpha': alpha, 'train_rows': int(stats.n[i]),
+                         'test_rows': int(n[i]), 'mse': mse[i, m], 'r2': r2[i, m]})
+    return PanelResult(list(panel.symbols), models, labels, coef, intercept, pd.DataFrame(rows))
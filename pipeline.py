@@ -0,0 +1,207 @@
+"""The notebook's workflow as functions: features, train, evaluate, predict.
+
+Each step takes a candle source (a pickle like the notebook's
+``binance-eth-usdt-spot-1m-2019-2023.pkl`` or a :mod:`store` directory) and
+an optional ``[start, end)`` time range, so a run can be scripted or driven by
+:mod:`cli` without the notebook:
+
+    >>> table = train('./eth-usdt-1m', './model', end='2023-01-01')
+    >>> evaluate('./eth-usdt-1m', './model', start='2023-01-01')
+    >>> predict('./eth-usdt-1m', './model', start='2023-03-01')
+    >>> predictors, table = train_horizons('./eth-usdt-1m', [5, 15, 30, 60], './models')
+
+Training fits every model of :class:`regression.Regression` on the first
+``1 - holdout`` of the rows, scores them on the rest after a purge gap of
+``target_horizon`` rows (chronologically, not the notebook's shuffled
+``train_test_split``, which leaks the overlapping 15 minute targets) and saves
+the best, or the requested, model as a :class:`serve.Predictor`. Only numpy
+and pandas are imported up front; scikit-learn is loaded when scores are
+computed and the backtester only when asked for.
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+from features import FeatureSpec, build_features, candle_arrays, feature_matrix, feature_rows, horizon_rows
+from profiling import stage
+from regression import MODELS, Regression
+from serve import Predictor
+from store import INDEX_COLUMN, _as_minute, from_minutes, read_candles
+
+OUTPUT_FORMATS = ('.pkl', '.csv')
+
+
+def load(source, start=None, end=None) -> dict:
+    """Candle arrays of a path, or of an already loaded frame or store dict, over ``[start, end)``."""
+    if isinstance(source, str):
+        return read_candles(source, start=start, end=end)
+    c = candle_arrays(source)
+    if start is None and end is None:
+        return c
+    minutes = np.asarray(c[INDEX_COLUMN])
+    keep = np.ones(len(minutes), dtype=bool)
+    if start is not None:
+        keep &= minutes >= _as_minute(start)
+    if end is not None:
+        keep &= minutes < _as_minute(end)
+    return {name: np.asarray(values)[keep] for name, values in c.items()}
+
+
+def write(frame, path: str) -> None:
+    """Write a frame or series as a pickle or CSV, by file extension."""
+    if path.endswith('.pkl'):
+        frame.to_pickle(path)
+    elif path.endswith('.csv'):
+        frame.to_csv(path)
+    else:
+        raise ValueError(f'{path}: unknown output format, expected one of {OUTPUT_FORMATS}')
+
+
+def features(source, spec: FeatureSpec | None = None, start=None, end=None, output: str | None = None,
+             cache_dir: str | None = None) -> pd.DataFrame:
+    """The notebook's ``data`` frame; with ``cache_dir`` it goes through a :class:`cache.FeatureCache`."""
+    if cache_dir is not None and isinstance(source, str) and start is None and end is None:
+        from cache import FeatureCache
+        frame = FeatureCache(cache_dir).get_or_build(source, spec).frame()
+    else:
+        frame = build_features(load(source, start, end), spec)
+    if output is not None:
+        write(frame, output)
+    return frame
+
+
+def _split(n: int, holdout: float, gap: int) -> tuple:
+    # (train_stop, test_start): train on [0, train_stop), score on
+    # [test_start, n). The ``gap`` rows in between are purged, since their
+    # targets (gap = the target horizon) reach into the holdout.
+    if not 0 < holdout < 1:
+        raise ValueError(f'holdout must be between 0 and 1, got {holdout}')
+    split = int(round(n * (1 - holdout)))
+    if split < 2 or split + gap >= n:
+        raise ValueError(f'{n} feature rows are too few for a holdout of {holdout} after a {gap}-row gap')
+    return split, split + gap
+
+
+def train(source, model_dir: str | None = None, spec: FeatureSpec | None = None, start=None, end=None,
+          holdout: float = 0.2, models=MODELS, model: str | None = None, alpha: float | None = None):
+    """Fit every model, score it on the holdout and save the chosen one to ``model_dir``.
+
+    ``model``/``alpha`` pick the saved model; by default it is the one with
+    the best holdout R^2, and ``model`` alone saves that model's best alpha.
+    The holdout starts ``target_horizon`` rows after the training rows.
+    Returns ``(predictor, scores)`` with one score row per fitted model and
+    alpha.
+    """
+    spec = spec or FeatureSpec()
+    _, matrix, _ = feature_rows(load(source, start, end), spec)
+    X, y = matrix[:, :-1], matrix[:, -1]
+    train_stop, test_start = _split(len(y), holdout, spec.target_horizon)
+    alphas = None
+    if model is not None and model != 'ols' and alpha is not None:
+        alphas = {model: [alpha]}
+    reg = Regression(models if model is None else (model,), alphas).fit(X[:train_stop], y[:train_stop])
+    scores = reg.score(X[test_start:], y[test_start:])
+    # Rows follow reg.labels_, and only ``model`` was fitted if one was given.
+    best = scores.r2.idxmax()
+    predictor = Predictor.from_regression(reg, scores.model[best], scores.alpha[best], spec)
+    scores['saved'] = scores.index == best
+    if model_dir is not None:
+        predictor.save(model_dir)
+    return predictor, scores
+
+
+def train_horizons(source, horizons, model_dir: str | None = None, spec: FeatureSpec | None = None, start=None,
+                   end=None, holdout: float = 0.2, models=MODELS, n_jobs: int | None = None):
+    """:func:`train` for several target horizons in one pass over the data.
+
+    The features, the Gram statistics and the OLS/Ridge solves are shared by
+    all horizons (see :func:`features.horizon_rows` and the multi-target
+    :class:`regression.Regression`); only the Lasso/ElasticNet paths are
+    per horizon, in ``n_jobs`` processes. The best model of each horizon is
+    saved to ``<model_dir>/<h>min``. The longest horizon sets the purge gap
+    before the holdout. Returns ``({horizon: predictor}, scores)``.
+    """
+    spec = spec or FeatureSpec()
+    horizons = tuple(horizons)
+    _, X, Y, _ = horizon_rows(load(source, start, end), horizons, spec)
+    train_stop, test_start = _split(len(Y), holdout, max(horizons))
+    reg = Regression(models, n_jobs=n_jobs).fit(X[:train_stop], Y[:train_stop])
+    scores = reg.score(X[test_start:], Y[test_start:])
+    scores.insert(2, 'horizon', np.asarray(horizons)[scores.pop('target').to_numpy()])
+    scores['saved'] = False
+    predictors = {}
+    for j, h in enumerate(horizons):
+        best = scores[scores.horizon == h].r2.idxmax()
+        scores.loc[best, 'saved'] = True
+        predictor = Predictor.from_regression(reg, scores.model[best], scores.alpha[best],
+                                              replace(spec, target_horizon=h), target=j)
+        if model_dir is not None:
+            predictor.save(os.path.join(model_dir, f'{h}min'))
+        predictors[h] = predictor
+    return predictors, scores
+
+
+def _as_predictor(model) -> Predictor:
+    return Predictor.load(model) if isinstance(model, str) else model
+
+
+def evaluate(source, model, start=None, end=None, backtest_params: pd.DataFrame | None = None) -> dict:
+    """Holdout metrics of a saved model on the complete feature rows of ``[start, end)``.
+
+    ``mse``/``r2`` as in the notebook, plus the share of rows where the
+    predicted and realized direction agree. With ``backtest_params``
+    (see :func:`backtest.param_grid`) the predictions are also backtested
+    and the metrics frame is returned under ``'backtest'``.
+    """
+    from sklearn.metrics import mean_squared_error, r2_score
+
+    predictor = _as_predictor(model)
+    c = load(source, start, end)
+    minutes, matrix, _ = feature_rows(c, predictor.spec)
+    X, y = matrix[:, :-1], matrix[:, -1]
+    if not len(y):
+        raise ValueError('no complete feature rows to evaluate on')
+    index = from_minutes(minutes)
+    with stage('predict', len(X)):
+        prediction = predictor.predict(X)
+    with stage('score', len(y)):
+        result = {
+            'model': predictor.name,
+            'rows': int(len(y)),
+            'start': str(index[0]),
+            'end': str(index[-1]),
+            'mse': float(mean_squared_error(y, prediction)),
+            'r2': float(r2_score(y, prediction)),
+            'hit_rate': float(np.mean(np.sign(prediction) == np.sign(y))),
+        }
+    if backtest_params is not None:
+        from backtest import backtest
+        series = pd.Series(prediction, index=index)
+        result['backtest'] = backtest(series, c, backtest_params, horizon=predictor.spec.target_horizon).metrics
+    return result
+
+
+def predict(source, model, start=None, end=None, last: int | None = None, output: str | None = None) -> pd.Series:
+    """Predicted ``target`` for every minute with complete features, including the latest ones.
+
+    Unlike training rows, these need no realized target, so the final
+    ``target_horizon`` minutes are predicted too. ``last`` keeps only the
+    most recent predictions.
+    """
+    predictor = _as_predictor(model)
+    c = load(source, start, end)
+    matrix = feature_matrix(c, predictor.spec)
+    X = matrix[:, :-1]
+    with stage('predict', len(X)):
+        complete = np.flatnonzero(np.isfinite(X).all(axis=1))
+        if last is not None:
+            complete = complete[len(complete) - min(last, len(complete)):]
+        prediction = predictor.predict(X[complete])
+    series = pd.Series(prediction, index=from_minutes(np.asarray(c[INDEX_COLUMN])[complete]), name='prediction')
+    if output is not None:
+        write(series.to_frame(), output)
+    return series
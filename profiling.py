@@ -0,0 +1,248 @@
+"""Per-stage timing instrumentation for the pipeline.
+
+The loaders, the feature kernel, the cleaning step and the models mark their
+stages with :func:`stage`. Nothing is recorded unless a :func:`trace` is
+active; until then :func:`stage` returns one shared do-nothing context, so the
+hooks cost a function call each.
+
+    >>> with trace('run.json') as tracer:
+    ...     data = build_features(read_candles('./eth-usdt-1m'))
+    ...     Regression().fit(*design_matrix(data)[:2])
+    >>> tracer.summary()
+
+Every stage records wall time, CPU time, the growth of the process's peak RSS
+and rows/sec. ``capture='tracemalloc'`` adds the peak traced Python
+allocation per stage, ``capture='cprofile'`` profiles the whole traced block
+and stores the top functions (and a ``.prof`` file next to the trace).
+Stages nest; ``path`` joins the enclosing stage names with ``/``. The JSON
+trace has a ``{'meta': ..., 'results': [...]}`` layout, which :mod:`bench`
+writes too, and :func:`compare` lines up two traces stage by stage.
+"""
+from __future__ import annotations
+
+import cProfile
+import contextlib
+import io
+import json
+import os
+import platform
+import pstats
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CAPTURES = (None, 'tracemalloc', 'cprofile')
+TOP_FUNCTIONS = 30
+
+
+def _max_rss() -> int | None:
+    # Peak resident set size of this process in bytes (ru_maxrss is KB on Linux, bytes on macOS).
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class _NullStage:
+    """What :func:`stage` returns while tracing is off."""
+
+    __slots__ = ('rows',)
+
+    def __enter__(self) -> '_NullStage':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NULL = _NullStage()
+_tracer = None
+
+
+def stage(name: str, rows: int | None = None):
+    """Context manager timing the stage ``name`` if a trace is active.
+
+    ``rows`` may also be assigned on the value it yields, once known.
+    """
+    if _tracer is None:
+        return _NULL
+    return _Stage(_tracer, name, rows)
+
+
+class _Stage:
+    __slots__ = ('tracer', 'name', 'rows', 'record', 'peak')
+
+    def __init__(self, tracer: 'Tracer', name: str, rows: int | None):
+        self.tracer = tracer
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self) -> '_Stage':
+        tracer = self.tracer
+        tracer.stack.append(self)
+        self.record = {
+            'stage': self.name,
+            'path': '/'.join(s.name for s in tracer.stack),
+            'depth': len(tracer.stack) - 1,
+            'start': time.perf_counter() - tracer.origin,
+            'rss_start': _max_rss(),
+            'cpu_start': time.process_time(),
+        }
+        if tracer.capture == 'tracemalloc':
+            # tracemalloc keeps a single peak: hand the enclosing stage its
+            # peak so far before restarting it for this stage.
+            current, peak = tracemalloc.get_traced_memory()
+            if len(tracer.stack) > 1:
+                parent = tracer.stack[-2]
+                parent.peak = max(parent.peak, peak)
+            self.peak = 0
+            self.record['traced_start'] = current
+            if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+
+                tracemalloc.reset_peak()
+        self.record['wall_start'] = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        wall = time.perf_counter() - self.record.pop('wall_start')
+        cpu = time.process_time() - self.record.pop('cpu_start')
+        tracer = self.tracer
+        record = self.record
+        rss_start = record.pop('rss_start')
+        rss = _max_rss()
+        record.update({
+            'seconds': wall,
+            'cpu_seconds': cpu,
+            'peak_rss_delta': rss - rss_start if rss is not None else None,
+            'rows': self.rows,
+            'rows_per_second': self.rows / wall if self.rows and wall else None,
+        })
+        if tracer.capture == 'tracemalloc':
+            peak = max(tracemalloc.get_traced_memory()[1], self.peak)
+            record['peak_bytes'] = peak - record.pop('traced_start')
+            if len(tracer.stack) > 1:
+                parent = tracer.stack[-2]
+                parent.peak = max(parent.peak, peak)
+        tracer.stack.pop()
+        tracer.records.append(record)
+
+
+class Tracer:
+    """Collects stage records while active; see :func:`trace`."""
+
+    def __init__(self, capture: str | None = None):
+        if capture not in CAPTURES:
+            raise ValueError(f'unknown capture {capture!r}, expected one of {CAPTURES}')
+        self.capture = capture
+        self.records = []
+        self.stack = []
+        self.origin = time.perf_counter()
+        self.profile = None
+        self.meta = {
+            'timestamp': pd.Timestamp.now(tz='UTC').isoformat(),
+            'argv': sys.argv,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'capture': capture,
+        }
+
+    def frame(self) -> pd.DataFrame:
+        """One row per stage call, in completion order."""
+        return pd.DataFrame(self.records)
+
+    def summary(self) -> pd.DataFrame:
+        return summary(self.to_json())
+
+    def to_json(self) -> dict:
+        trace = {'meta': self.meta, 'results': self.records}
+        if self.profile is not None:
+            trace['profile'] = self.profile
+        return trace
+
+    def save(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f, indent=1, default=float)
+
+
+def _top_functions(profiler: cProfile.Profile) -> list:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({'function': f'{os.path.basename(filename)}:{line}({function})', 'calls': calls,
+                     'tottime': total, 'cumtime': cumulative})
+    return sorted(rows, key=lambda r: -r['cumtime'])[:TOP_FUNCTIONS]
+
+
+@contextlib.contextmanager
+def trace(path: str | None = None, capture: str | None = None):
+    """Record every :func:`stage` inside the block; write the JSON trace to ``path`` if given."""
+    global _tracer
+    if _tracer is not None:
+        raise RuntimeError('a trace is already active')
+    tracer = Tracer(capture)
+    started_tracemalloc = capture == 'tracemalloc' and not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if capture == 'cprofile' else None
+    _tracer = tracer
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield tracer
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            tracer.profile = _top_functions(profiler)
+        _tracer = None
+        if started_tracemalloc:
+            tracemalloc.stop()
+        if path is not None:
+            tracer.save(path)
+            if profiler is not None:
+                profiler.dump_stats(os.path.splitext(path)[0] + '.prof')
+
+
+def load_trace(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def summary(trace: dict) -> pd.DataFrame:
+    """Calls and total seconds, CPU seconds and rows per stage path of a JSON trace.
+
+    Traces captured with ``'tracemalloc'`` also get the largest ``peak_bytes``.
+    """
+    frame = pd.DataFrame(trace['results'])
+    if frame.empty:
+        return frame
+    columns = dict(calls=('stage', 'size'), seconds=('seconds', 'sum'), cpu_seconds=('cpu_seconds', 'sum'),
+                   rows=('rows', 'sum'))
+    if 'peak_bytes' in frame:
+        columns['peak_bytes'] = ('peak_bytes', 'max')
+    out = frame.groupby('path', sort=False).agg(**columns)
+    out['rows_per_second'] = out.rows / out.seconds
+    return out
+
+
+def compare(baseline: dict, current: dict) -> pd.DataFrame:
+    """Total ``seconds`` per stage path of two traces and their ratio (current / baseline).
+
+    ``peak_bytes`` and ``memory_ratio`` are added when both traces have them.
+    """
+    old, new = summary(baseline), summary(current)
+    out = pd.DataFrame({'seconds_baseline': old.seconds, 'seconds': new.seconds})
+    out['time_ratio'] = out.seconds / out.seconds_baseline
+    if 'peak_bytes' in old and 'peak_bytes' in new:
+        out['peak_bytes_baseline'], out['peak_bytes'] = old.peak_bytes, new.peak_bytes
+        out['memory_ratio'] = out.peak_bytes / out.peak_bytes_baseline
+    return out.loc[[p for p in new.index if p in out.index]]
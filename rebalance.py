@@ -0,0 +1,176 @@
+"""Batched portfolio rebalancing simulator over aligned multi-asset prices.
+
+Compares rebalancing rules for a basket of pairs (see :class:`panel.Panel`)
+the way the README describes, for thousands of scenarios at once. Every
+scenario is a target weight vector plus a rule:
+
+* target-weight buy and hold: allocate once, never rebalance
+  (``frequency=0``, ``band=0``),
+* calendar: rebalance to the targets every ``frequency`` bars, aligned to
+  the clock (with hourly bars, ``frequency=24`` is every midnight UTC),
+* threshold band: rebalance whenever any weight drifts more than ``band``
+  from its target,
+
+or calendar and band together. Each rebalance pays ``fee`` on the value
+traded. Prices are sampled into bars of ``every`` minutes; the simulation
+steps through the bars once, updating all scenarios together as
+``(scenarios, assets)`` arrays, and returns one record per scenario in a
+compact structured array (:data:`RESULT_DTYPE`).
+
+    >>> scenarios = Scenarios.grid([[.5, .5], [.6, .4]], frequencies=[0, 24, 168], bands=[0, .05, .1])
+    >>> results = simulate(panel, scenarios, every=60)
+    >>> summary_frame(scenarios, results).sort_values('sharpe')
+"""
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from store import INDEX_COLUMN
+
+MINUTES_PER_YEAR = 365 * 24 * 60
+
+RESULT_DTYPE = np.dtype([
+    ('total_return', 'f8'),
+    ('annual_return', 'f8'),
+    ('volatility', 'f8'),
+    ('sharpe', 'f8'),
+    ('max_drawdown', 'f8'),
+    ('rebalances', 'i4'),
+    ('turnover', 'f8'),
+    ('costs', 'f8'),
+])
+
+
+@dataclass
+class Scenarios:
+    """``weights`` ``(scenarios, assets)`` plus per-scenario ``frequency`` (bars), ``band`` and ``fee``."""
+
+    weights: np.ndarray
+    frequency: np.ndarray
+    band: np.ndarray
+    fee: np.ndarray
+
+    def __post_init__(self):
+        self.weights = np.atleast_2d(np.asarray(self.weights, dtype=np.float64))
+        n = len(self.weights)
+        self.frequency = np.broadcast_to(np.asarray(self.frequency, dtype=np.int64), (n,))
+        self.band = np.broadcast_to(np.asarray(self.band, dtype=np.float64), (n,))
+        self.fee = np.broadcast_to(np.asarray(self.fee, dtype=np.float64), (n,))
+        if not np.allclose(self.weights.sum(axis=1), 1):
+            raise ValueError('target weights must sum to 1')
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    @classmethod
+    def grid(cls, weights, frequencies=(0,), bands=(0.0,), fees=(0.001,)) -> 'Scenarios':
+        """Every combination of weight vector, frequency, band and fee."""
+        rows = list(itertools.product(range(len(weights)), frequencies, bands, fees))
+        w = np.asarray(weights, dtype=np.float64)
+        return cls(w[[r[0] for r in rows]], [r[1] for r in rows], [r[2] for r in rows], [r[3] for r in rows])
+
+
+def bar_prices(minutes, close, every: int = 60):
+    """Last close of each ``every``-minute bar, forward-filled per asset.
+
+    Returns ``(bar, prices)``: the bar number (``minute // every``) and a
+    ``(bars, assets)`` price matrix. Assets without a price yet keep NaN.
+    """
+    minutes = np.asarray(minutes, dtype=np.int64)
+    close = np.asarray(close, dtype=np.float64)
+    bar = minutes // every
+    last = np.flatnonzero(np.concatenate([bar[1:] != bar[:-1], [True]])) if len(bar) else np.array([], dtype=np.int64)
+    # Forward-fill so a missing last minute falls back to the latest earlier price.
+    rows = np.where(np.isnan(close), -1, np.arange(len(close))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = np.where(rows >= 0, close[np.maximum(rows, 0), np.arange(close.shape[1])], np.nan)
+    return bar[last], filled[last]
+
+
+def simulate(prices, scenarios: Scenarios, every: int = 60) -> np.ndarray:
+    """Run every scenario over ``prices`` and return a :data:`RESULT_DTYPE` array.
+
+    ``prices`` is a :class:`panel.Panel` (its closes are used) or a
+    ``(minutes, close)`` pair with ``close`` shaped ``(minutes, assets)``.
+    An asset's bars before its first price count as flat.
+    """
+    if hasattr(prices, 'arrays'):
+        c = prices.arrays()
+        minutes, close = c[INDEX_COLUMN], c['close']
+    else:
+        minutes, close = prices
+    bar, p = bar_prices(minutes, close, every)
+    if p.shape[1] != scenarios.weights.shape[1]:
+        raise ValueError(f'{p.shape[1]} assets but weights for {scenarios.weights.shape[1]}')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        growth = np.nan_to_num(p[1:] / p[:-1], nan=1.0, posinf=1.0)
+
+    target = scenarios.weights
+    fee = scenarios.fee
+    calendar = scenarios.frequency > 0
+    frequency = np.maximum(scenarios.frequency, 1)
+    banded = scenarios.band > 0
+    n = len(scenarios)
+
+    # Initial allocation at the first bar is a trade from cash.
+    holdings = target * (1 - fee)[:, None]
+    turnover = np.ones(n)
+    costs = fee.copy()
+    rebalances = np.zeros(n, dtype=np.int64)
+    nav = holdings.sum(axis=1)
+    peak = np.ones(n)
+    drawdown = np.zeros(n)
+    log_sum = np.log(nav)
+    log_sq = log_sum ** 2
+
+    for t in range(len(growth)):
+        holdings *= growth[t]
+        value = holdings.sum(axis=1)
+        due = calendar & (bar[t + 1] % frequency == 0)
+        if banded.any():
+            drift = np.abs(holdings / value[:, None] - target).max(axis=1)
+            due |= banded & (drift > scenarios.band)
+        if due.any():
+            traded = np.abs(target[due] * value[due, None] - holdings[due]).sum(axis=1)
+            cost = traded * fee[due]
+            holdings[due] = target[due] * (value[due] - cost)[:, None]
+            turnover[due] += traded / value[due]
+            costs[due] += cost / value[due]
+            rebalances[due] += 1
+            value = holdings.sum(axis=1)
+        step = np.log(value / nav)
+        log_sum += step
+        log_sq += step ** 2
+        nav = value
+        np.maximum(peak, nav, out=peak)
+        np.maximum(drawdown, 1 - nav / peak, out=drawdown)
+
+    steps = len(growth) + 1
+    bars_per_year = MINUTES_PER_YEAR / every
+    mean = log_sum / steps
+    volatility = np.sqrt(np.maximum(log_sq / steps - mean ** 2, 0) * bars_per_year)
+    out = np.empty(n, dtype=RESULT_DTYPE)
+    out['total_return'] = nav - 1
+    out['annual_return'] = np.expm1(mean * bars_per_year)
+    out['volatility'] = volatility
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out['sharpe'] = mean * bars_per_year / volatility
+    out['max_drawdown'] = drawdown
+    out['rebalances'] = rebalances
+    out['turnover'] = turnover
+    out['costs'] = costs
+    return out
+
+
+def summary_frame(scenarios: Scenarios, results: np.ndarray, assets=None) -> pd.DataFrame:
+    """Scenario definitions next to their results, one row per scenario."""
+    assets = assets or [f'w{i}' for i in range(scenarios.weights.shape[1])]
+    frame = pd.DataFrame(scenarios.weights, columns=list(assets))
+    frame['frequency'] = scenarios.frequency
+    frame['band'] = scenarios.band
+    frame['fee'] = scenarios.fee
+    return pd.concat([frame, pd.DataFrame(results)], axis=1)
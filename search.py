@@ -0,0 +1,292 @@
+"""Hyperparameter search over feature windows, target horizon and regularization.
+
+Trying other MA windows or k-minute returns used to mean editing the feature
+cell and rebuilding the whole frame for every candidate. :class:`PartialSums`
+instead computes, once, every window-independent column plus the prefix sums of
+close returns; the design matrix for any window set and target horizon is then
+assembled from them in O(n) per column (:meth:`PartialSums.design`).
+
+:func:`search` scores a grid (or a random sample) of
+``(ma_windows, return_horizons, target_horizon, model, alpha)`` configurations
+on walk-forward folds with successive halving: every configuration is scored on
+the first ``min_folds`` folds, the best ``1 / eta`` survive to ``eta`` times as
+many folds, and so on until the survivors have seen every fold. Configurations
+sharing a window set and horizon share one design matrix and one fit per fold,
+and those groups run in a process pool that maps the partial sums from shared
+memory.
+
+    >>> space = SearchSpace(ma_windows=[(5, 15, 30, 60), (10, 30, 120)], target_horizons=[15, 30])
+    >>> result = search(d, space, train=200_000, test=20_000)
+    >>> result.best
+"""
+from __future__ import annotations
+
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+import pandas as pd
+
+from features import FeatureSpec, candle_arrays, feature_matrix, prefix_sums, window_mean
+from regression import MODELS, RIDGE_ALPHAS, GramStats, Regression
+from sessions import NOTEBOOK_SESSIONS
+from sharedmem import SharedArrays, arrays, attach
+from walkforward import walk_forward_folds
+
+# Fixed L1 grids: a search compares configurations at the same alphas, so the
+# data-dependent automatic paths of Regression are not used here.
+L1_ALPHAS = np.logspace(-8, -4, 5)
+
+DEFAULT_ALPHAS = {'ridge': RIDGE_ALPHAS, 'lasso': L1_ALPHAS, 'elasticnet': L1_ALPHAS}
+
+
+@dataclass(frozen=True)
+class Config:
+    """One candidate: a feature set plus one fitted model."""
+
+    ma_windows: tuple
+    return_horizons: tuple
+    target_horizon: int
+    model: str
+    alpha: float = 0.0
+
+    @property
+    def group(self) -> tuple:
+        """The part of the configuration that decides the design matrix."""
+        return self.ma_windows, self.return_horizons, self.target_horizon
+
+    def spec(self, sessions=NOTEBOOK_SESSIONS) -> FeatureSpec:
+        return FeatureSpec(self.ma_windows, self.return_horizons, self.target_horizon, sessions)
+
+
+@dataclass
+class SearchSpace:
+    """Candidate values per dimension; the defaults are the notebook's features."""
+
+    ma_windows: list = field(default_factory=lambda: [(5, 15, 30, 60)])
+    return_horizons: list = field(default_factory=lambda: [(5, 15, 30, 60)])
+    target_horizons: list = field(default_factory=lambda: [15])
+    models: tuple = MODELS
+    alphas: dict = field(default_factory=lambda: dict(DEFAULT_ALPHAS))
+
+    def configs(self, n_samples: int | None = None, seed: int = 0) -> list:
+        """Every configuration, or ``n_samples`` of them drawn without replacement."""
+        models = []
+        for model in self.models:
+            alphas = [0.0] if model == 'ols' else self.alphas[model]
+            models.extend((model, float(alpha)) for alpha in alphas)
+        grid = [Config(tuple(w), tuple(k), int(h), m, a)
+                for w, k, h, (m, a) in itertools.product(self.ma_windows, self.return_horizons,
+                                                         self.target_horizons, models)]
+        if n_samples is not None and n_samples < len(grid):
+            rng = np.random.default_rng(seed)
+            grid = [grid[i] for i in np.sort(rng.choice(len(grid), n_samples, replace=False))]
+        return grid
+
+
+class PartialSums:
+    """Window-independent feature columns and close-return prefix sums, computed once.
+
+    ``arrays`` holds ``base`` (feature-major, one row per column in
+    ``base_columns``), ``close`` and the ``csum``/``cnan`` prefix sums from
+    :func:`features.prefix_sums`.
+    """
+
+    def __init__(self, arrays: dict, sessions=NOTEBOOK_SESSIONS):
+        self.arrays = arrays
+        self.sessions = tuple(sessions)
+        self.base_columns = self._base_spec(self.sessions).columns[:-1]
+
+    @staticmethod
+    def _base_spec(sessions) -> FeatureSpec:
+        return FeatureSpec(ma_windows=(), return_horizons=(), target_horizon=1, sessions=sessions)
+
+    @classmethod
+    def from_candles(cls, candles, sessions=NOTEBOOK_SESSIONS) -> 'PartialSums':
+        c = candle_arrays(candles)
+        spec = cls._base_spec(sessions)
+        matrix = feature_matrix(c, spec)
+        base = np.ascontiguousarray(matrix[:, :-1].T)
+        csum, cnan = prefix_sums(base[spec.columns.index('close returns')])
+        close = np.asarray(c['close'], dtype=np.float64)
+        return cls({'base': base, 'close': close, 'csum': csum, 'cnan': cnan}, sessions)
+
+    def __len__(self) -> int:
+        return len(self.arrays['close'])
+
+    def design(self, spec: FeatureSpec, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """Rows ``start:stop`` of ``feature_matrix(candles, spec)``, without rebuilding the frame."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        columns = spec.columns
+        out = np.empty((len(columns), stop - start)).swapaxes(0, 1)
+        col = {name: j for j, name in enumerate(columns)}
+        close, csum, cnan = self.arrays['close'], self.arrays['csum'], self.arrays['cnan']
+        for i, name in enumerate(self.base_columns):
+            out[:, col[name]] = self.arrays['base'][i, start:stop]
+        for w in spec.ma_windows:
+            window_mean(csum, cnan, w, out[:, col[f'MA{w}']], start)
+        for k in spec.return_horizons:
+            _returns(close, -k, 0, out[:, col[f'{k} min returns']], start)
+        _returns(close, 0, spec.target_horizon, out[:, col['target']], start)
+        return out
+
+
+def _returns(close: np.ndarray, lag: int, lead: int, out: np.ndarray, start: int) -> None:
+    # out[i] = close[start + i + lead] / close[start + i + lag] - 1, NaN off the ends.
+    stop = start + len(out)
+    lo, hi = max(start, -lag), min(stop, len(close) - lead)
+    out[:] = np.nan
+    if lo < hi:
+        np.divide(close[lo + lead:hi + lead], close[lo + lag:hi + lag], out=out[lo - start:hi - start])
+        out[lo - start:hi - start] -= 1
+
+
+@dataclass
+class SearchResult:
+    """``configs`` has one row per configuration, best first; ``scores`` one row per fold scored."""
+
+    folds: list
+    configs: pd.DataFrame
+    scores: pd.DataFrame
+
+    @property
+    def best(self) -> Config:
+        row = self.configs.iloc[0]
+        return Config(row.ma_windows, row.return_horizons, int(row.target_horizon), row.model, float(row.alpha))
+
+
+_partial = {}
+
+
+def _init_worker(layout, sessions) -> None:
+    attach(layout)
+    _partial['sums'] = PartialSums(arrays(), sessions)
+
+
+def _evaluate(group: tuple, candidates: list, folds: list, sums: PartialSums | None = None) -> list:
+    # Score every (model, alpha) in ``candidates`` for one feature group on ``folds``.
+    sums = _partial['sums'] if sums is None else sums
+    config = Config(*group, model='ols')
+    spec = config.spec(sums.sessions)
+    start = min(f.train_start for f in folds)
+    Z = sums.design(spec, start, max(f.test_stop for f in folds))
+    valid = ~np.isnan(Z).any(axis=1)
+
+    models = tuple(m for m in MODELS if any(c[0] == m for c in candidates))
+    alphas = {m: [a for c, a in candidates if c == m] for m in models if m != 'ols'}
+    model = Regression(models, alphas)
+    wanted = set(candidates)
+    rows = []
+    for fold in folds:
+        train = Z[fold.train_start - start:fold.train_stop - start]
+        train = train[valid[fold.train_start - start:fold.train_stop - start]]
+        test = Z[fold.test_start - start:fold.test_stop - start]
+        test = test[valid[fold.test_start - start:fold.test_stop - start]]
+        if len(train) <= Z.shape[1] or not len(test):
+            continue
+        model.fit_stats(GramStats.from_arrays(train[:, :-1], train[:, -1]))
+        scores = model.score(test[:, :-1], test[:, -1])
+        for (m, a), mse, r2 in zip(model.labels_, scores.mse, scores.r2):
+            if (m, a) in wanted:
+                rows.append((replace(config, model=m, alpha=a), fold.index, mse, r2))
+    return rows
+
+
+def _rungs(n_folds: int, min_folds: int, eta: int) -> list:
+    budgets = [min(min_folds, n_folds)]
+    while budgets[-1] < n_folds:
+        budgets.append(min(budgets[-1] * eta, n_folds))
+    return budgets
+
+
+def search(candles, space: SearchSpace | None = None, train: int = 200_000, test: int = 20_000,
+           step: int | None = None, n_samples: int | None = None, eta: int = 3, min_folds: int = 1,
+           sessions=NOTEBOOK_SESSIONS, seed: int = 0, n_jobs: int | None = None) -> SearchResult:
+    """Successive-halving search of ``space`` on walk-forward folds of ``candles``.
+
+    ``candles`` is the notebook's ``d`` frame or a store dict. Folds are laid
+    out over candle rows (``train``/``test``/``step`` as in
+    :func:`walkforward.walk_forward_folds`) with a purge gap of the longest
+    target horizon, so every configuration is scored on the same minutes.
+    Configurations are ranked by mean out-of-sample R^2 over the folds they
+    reached; ``n_samples`` turns the grid into a random search.
+    """
+    space = space or SearchSpace()
+    configs = space.configs(n_samples, seed)
+    if not configs:
+        raise ValueError('the search space is empty')
+    sums = PartialSums.from_candles(candles, sessions)
+    gap = max(c.target_horizon for c in configs)
+    folds = walk_forward_folds(len(sums), train, test, step, gap)
+    if not folds:
+        raise ValueError(f'{len(sums)} rows are too few for one {train}+{gap}+{test} row fold')
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    def tasks(survivors, rung_folds):
+        groups = {}
+        for c in survivors:
+            groups.setdefault(c.group, []).append((c.model, c.alpha))
+        # Split the folds too when there are fewer groups than workers.
+        parts = max(1, min(len(rung_folds), n_jobs // len(groups)))
+        size = math.ceil(len(rung_folds) / parts)
+        return [(group, candidates, rung_folds[i:i + size])
+                for group, candidates in groups.items() for i in range(0, len(rung_folds), size)]
+
+    def run(pool, survivors, rung_folds):
+        jobs = tasks(survivors, rung_folds)
+        if pool is None:
+            return [row for job in jobs for row in _evaluate(*job, sums=sums)]
+        return [row for rows in pool.map(_evaluate, *zip(*jobs)) for row in rows]
+
+    records = []
+    reached = {}
+    survivors = configs
+
+    def rank(survivors):
+        r2 = {c: [] for c in survivors}
+        for c, _, _, score in records:
+            if c in r2:
+                r2[c].append(score)
+        return sorted(survivors, key=lambda c: -np.mean(r2[c]) if r2[c] else np.inf)
+
+    def halve(pool):
+        nonlocal survivors
+        done = 0
+        for rung, budget in enumerate(_rungs(len(folds), min_folds, eta)):
+            records.extend(run(pool, survivors, folds[done:budget]))
+            done = budget
+            for c in survivors:
+                reached[c] = (rung, budget)
+            ranked = rank(survivors)
+            if budget < len(folds):
+                survivors = ranked[:max(1, math.ceil(len(ranked) / eta))]
+
+    if n_jobs == 1:
+        halve(None)
+    else:
+        with SharedArrays(sums.arrays) as shared:
+            with ProcessPoolExecutor(n_jobs, initializer=_init_worker, initargs=(shared.layout, sums.sessions)) as pool:
+                halve(pool)
+
+    scores = pd.DataFrame(records, columns=['config', 'fold', 'mse', 'r2'])
+    summary = scores.groupby('config', sort=False).agg(mse=('mse', 'mean'), r2=('r2', 'mean'),
+                                                        folds=('fold', 'nunique'))
+    table = pd.DataFrame([{
+        'ma_windows': c.ma_windows,
+        'return_horizons': c.return_horizons,
+        'target_horizon': c.target_horizon,
+        'model': c.model,
+        'alpha': c.alpha,
+        'rung': reached[c][0],
+        'folds': summary.folds.get(c, 0),
+        'mse': summary.mse.get(c, np.nan),
+        'r2': summary.r2.get(c, np.nan),
+    } for c in configs])
+    table = table.sort_values(['rung', 'r2'], ascending=[False, False], kind='stable').reset_index(drop=True)
+
+    for name in ('ma_windows', 'return_horizons', 'target_horizon', 'model', 'alpha'):
+        scores.insert(scores.columns.get_loc('config'), name, [getattr(c, name) for c in scores.config])
+    return SearchResult(folds, table, scores.drop(columns='config'))
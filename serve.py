@@ -0,0 +1,305 @@
+"""Online inference for the 15 minute return prediction.
+
+A fitted linear model is reduced to one flat float64 array,
+``[mean | scale | coef | intercept]`` (the scaler followed by the
+coefficients on the scaled features), which :class:`Predictor` folds into raw
+feature weights on load. :class:`InferenceService` keeps one
+:class:`online.FeatureEngine` per symbol and the latest feature row of every
+symbol in one matrix, so
+
+* :meth:`InferenceService.update` turns one new candle into a prediction in
+  a few microseconds, and
+* :meth:`InferenceService.predict_all` predicts every symbol with a single
+  matrix-vector product.
+
+:func:`serve` exposes the same calls over a small local HTTP endpoint on
+asyncio, and :func:`replay` feeds historical candles through a service in
+minute order, standing in for the live feed:
+
+    >>> predictor = Predictor.from_regression(reg, 'ridge', 10.0)
+    >>> predictor.save('./model-ridge')
+    >>> service = InferenceService(Predictor.load('./model-ridge'), history={'ETH': d})
+    >>> service.update('ETH', minute, open, high, low, close, vwap, volume, usd_volume, count)
+
+    python serve.py ./model-ridge --history ETH=./eth-usdt-1m --port 8765
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from features import FeatureSpec, candle_arrays
+from online import FeatureEngine
+from sessions import Session
+from store import CANDLE_COLUMNS, INDEX_COLUMN, META_FILE, CandleStore, read_candles
+
+PARAMS_FILE = 'params.npy'
+
+
+def _spec_from_dict(spec: dict) -> FeatureSpec:
+    sessions = tuple(Session(s['name'], tuple(tuple(w) for w in s['windows']), s['tz'], tuple(s['days']))
+                     for s in spec['sessions'])
+    return FeatureSpec(tuple(spec['ma_windows']), tuple(spec['return_horizons']), spec['target_horizon'], sessions)
+
+
+class Predictor:
+    """A linear model over the feature columns of ``spec`` (all but ``target``).
+
+    ``params`` is the flat ``[mean | scale | coef | intercept]`` array; the
+    prediction is ``((x - mean) / scale) @ coef + intercept``, evaluated as
+    ``x @ weights + bias``.
+    """
+
+    def __init__(self, params, spec: FeatureSpec | None = None, name: str = ''):
+        self.spec = spec or FeatureSpec()
+        self.columns = self.spec.columns[:-1]
+        self.name = name
+        p = len(self.columns)
+        self.params = np.asarray(params, dtype=np.float64).ravel()
+        if self.params.shape != (3 * p + 1,):
+            raise ValueError(f'expected {3 * p + 1} parameters for {p} features, got {self.params.size}')
+        mean, scale, coef = self.params[:p], self.params[p:2 * p], self.params[2 * p:3 * p]
+        self.weights = coef / scale
+        self.bias = float(self.params[-1] - self.weights @ mean)
+
+    @classmethod
+    def from_regression(cls, reg, model: str = 'ols', alpha: float | None = None,
+                        spec: FeatureSpec | None = None, target: int = 0) -> 'Predictor':
+        """One fitted model of a :class:`regression.Regression` (already on the raw scale).
+
+        ``target`` picks the output column of a multi-target fit.
+        """
+        i = reg._index(model, alpha)
+        coef, intercept = reg.coef_[i], reg.intercept_[i]
+        if coef.ndim == 2:
+            coef, intercept = coef[target], intercept[target]
+        p = len(coef)
+        params = np.concatenate([np.zeros(p), np.ones(p), coef, [intercept]])
+        return cls(params, spec, name=f'{model}({reg.labels_[i][1]:.6g})')
+
+    @classmethod
+    def from_sklearn(cls, scaler, estimator, spec: FeatureSpec | None = None) -> 'Predictor':
+        """The notebook's ``StandardScaler`` plus a fitted sklearn linear model."""
+        params = np.concatenate([scaler.mean_, scaler.scale_, np.ravel(estimator.coef_),
+                                 [float(np.ravel(estimator.intercept_)[0])]])
+        return cls(params, spec, name=type(estimator).__name__)
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, PARAMS_FILE), self.params)
+        with open(os.path.join(path, META_FILE), 'w') as f:
+            json.dump({'name': self.name, 'columns': self.columns, 'spec': dataclasses.asdict(self.spec)}, f, indent=1)
+
+    @classmethod
+    def load(cls, path: str) -> 'Predictor':
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        predictor = cls(np.load(os.path.join(path, PARAMS_FILE)), _spec_from_dict(meta['spec']), meta['name'])
+        if predictor.columns != meta['columns']:
+            raise ValueError(f'{path}: saved columns do not match the feature spec')
+        return predictor
+
+    def predict(self, X) -> np.ndarray:
+        """Predictions for ``(n, n_features)`` rows (a trailing target column is ignored)."""
+        X = np.asarray(X)
+        return X[..., :len(self.columns)] @ self.weights + self.bias
+
+
+class InferenceService:
+    """Incremental feature state and latest predictions for a set of symbols."""
+
+    def __init__(self, predictor: Predictor, symbols=(), history: dict | None = None):
+        self.predictor = predictor
+        self.symbols = []
+        self.slots = {}
+        self.engines = {}
+        self.minutes = {}
+        # Latest feature row of every symbol, one row per symbol.
+        self.rows = np.full((0, len(predictor.columns)), np.nan)
+        for symbol in symbols:
+            self.add(symbol)
+        for symbol, candles in (history or {}).items():
+            self.add(symbol, candles)
+
+    def add(self, symbol: str, history=None) -> None:
+        """Track ``symbol``, seeding its features from the tail of ``history`` if given."""
+        spec = self.predictor.spec
+        if symbol not in self.slots:
+            self.slots[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            self.rows = np.vstack([self.rows, np.full(len(self.predictor.columns), np.nan)])
+        if history is None:
+            self.engines[symbol] = FeatureEngine(spec)
+            self.minutes[symbol] = None
+            return
+        needed = spec.warmup + spec.target_horizon + 1
+        tail = _read_tail(history, needed) if isinstance(history, str) else _tail(candle_arrays(history), needed)
+        engine = FeatureEngine(spec)
+        rows = engine.update_many(tail)
+        self.engines[symbol] = engine
+        self.minutes[symbol] = int(tail[INDEX_COLUMN][-1]) if len(rows) else None
+        if len(rows):
+            self.rows[self.slots[symbol]] = rows[-1, :-1]
+
+    def update(self, symbol: str, minute, open, high, low, close, vwap, volume, usd_volume, count) -> float:
+        """Add one candle for ``symbol`` and return its predicted ``target``."""
+        row = self.engines[symbol].update(minute, open, high, low, close, vwap, volume, usd_volume, count)
+        features = row[:-1]
+        self.rows[self.slots[symbol]] = features
+        self.minutes[symbol] = int(minute)
+        return float(features @ self.predictor.weights) + self.predictor.bias
+
+    def update_many(self, candles: dict) -> dict:
+        """Feed ``{symbol: (minute, open, ..., count)}`` and predict all of them in one product."""
+        for symbol, candle in candles.items():
+            row = self.engines[symbol].update(*candle)
+            self.rows[self.slots[symbol]] = row[:-1]
+            self.minutes[symbol] = int(candle[0])
+        predictions = self.predict_all()
+        return {symbol: float(predictions[self.slots[symbol]]) for symbol in candles}
+
+    def predict_all(self) -> np.ndarray:
+        """Latest prediction of every symbol, in ``symbols`` order (NaN while warming up)."""
+        return self.rows @ self.predictor.weights + self.predictor.bias
+
+    def latest(self) -> dict:
+        predictions = self.predict_all()
+        return {s: {'minute': self.minutes[s], 'prediction': _json_float(predictions[i])}
+                for i, s in enumerate(self.symbols)}
+
+
+def _tail(c: dict, rows: int) -> dict:
+    n = len(c[INDEX_COLUMN])
+    return {k: np.asarray(v)[max(n - rows, 0):] for k, v in c.items()}
+
+
+def _read_tail(path: str, rows: int) -> dict:
+    # The last ``rows`` candles of a store, reading only the partitions that
+    # hold them; a pickle has to be loaded whole.
+    if not os.path.isdir(path):
+        return _tail(read_candles(path), rows)
+    store = CandleStore(path)
+    start, total = None, 0
+    for p in reversed(store.partitions):
+        start, total = p['start'], total + p['rows']
+        if total >= rows:
+            break
+    return _tail(store.read(start=start), rows)
+
+
+def _json_float(value: float):
+    return None if value != value else float(value)
+
+
+def replay(service: InferenceService, sources: dict, start=None, end=None):
+    """Feed historical candles through ``service`` minute by minute.
+
+    ``sources`` maps symbol to a candle frame, store path or pickle path.
+    Yields ``(minute, {symbol: prediction})`` for every minute in which at
+    least one symbol has a candle.
+    """
+    columns = {}
+    for symbol, source in sources.items():
+        c = candle_arrays(read_candles(source, start=start, end=end) if isinstance(source, str) else source)
+        columns[symbol] = [np.asarray(c[INDEX_COLUMN]).tolist()] + [np.asarray(c[k]).tolist() for k in CANDLE_COLUMNS]
+        if symbol not in service.slots:
+            service.add(symbol)
+    positions = dict.fromkeys(columns, 0)
+    while True:
+        heads = {s: cols[0][positions[s]] for s, cols in columns.items() if positions[s] < len(cols[0])}
+        if not heads:
+            return
+        minute = min(heads.values())
+        batch = {}
+        for symbol, head in heads.items():
+            if head == minute:
+                i = positions[symbol]
+                batch[symbol] = tuple(col[i] for col in columns[symbol])
+                positions[symbol] = i + 1
+        yield minute, service.update_many(batch)
+
+
+async def _handle(service: InferenceService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    # Just enough HTTP/1.1 for local clients: one request per connection.
+    try:
+        try:
+            request = await reader.readuntil(b'\r\n\r\n')
+            method, target = request.split(b'\r\n', 1)[0].decode().split(' ')[:2]
+            length = 0
+            for line in request.decode().split('\r\n')[1:]:
+                if line.lower().startswith('content-length:'):
+                    length = int(line.split(':', 1)[1])
+            body = json.loads(await reader.readexactly(length)) if length else None
+            status, payload = 200, _route(service, method, target, body)
+        except KeyError as exc:
+            status, payload = 404, {'error': f'unknown symbol or field {exc}'}
+        except (ValueError, TypeError, asyncio.IncompleteReadError) as exc:
+            status, payload = 400, {'error': str(exc)}
+        data = json.dumps(payload).encode()
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found'}[status]
+        writer.write(f'HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n'
+                     f'Content-Length: {len(data)}\r\nConnection: close\r\n\r\n'.encode() + data)
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+def _route(service: InferenceService, method: str, target: str, body):
+    url = urlsplit(target)
+    if method == 'GET' and url.path == '/health':
+        return {'model': service.predictor.name, 'symbols': service.symbols}
+    if method == 'GET' and url.path == '/predict':
+        latest = service.latest()
+        symbols = parse_qs(url.query).get('symbol')
+        return {s: latest[s] for s in symbols} if symbols else latest
+    if method == 'POST' and url.path == '/update':
+        # {"ETH": {"minute": ..., "open": ..., ...}, ...}
+        if not isinstance(body, dict) or not all(isinstance(candle, dict) for candle in body.values()):
+            raise ValueError('expected {symbol: {"minute": ..., "open": ..., ..., "count": ...}}')
+        unknown = set(body) - set(service.slots)
+        if unknown:
+            raise KeyError(sorted(unknown)[0])
+        candles = {symbol: (candle[INDEX_COLUMN],) + tuple(candle[k] for k in CANDLE_COLUMNS)
+                   for symbol, candle in body.items()}
+        return {s: _json_float(p) for s, p in service.update_many(candles).items()}
+    raise KeyError(f'{method} {url.path}')
+
+
+async def serve(service: InferenceService, host: str = '127.0.0.1', port: int = 8765) -> asyncio.AbstractServer:
+    """Start the HTTP endpoint; ``await server.serve_forever()`` to run it.
+
+    ``GET /health``, ``GET /predict[?symbol=ETH]`` and ``POST /update`` with
+    ``{symbol: {"minute": ..., "open": ..., ..., "count": ...}}``, which
+    answers ``{symbol: prediction}``.
+    """
+    return await asyncio.start_server(lambda r, w: _handle(service, r, w), host, port)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('model', help='directory written by Predictor.save')
+    parser.add_argument('--history', action='append', default=[], metavar='SYMBOL=PATH',
+                        help='seed a symbol from a candle store or pickle (repeatable)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    history = dict(item.split('=', 1) for item in args.history)
+    service = InferenceService(Predictor.load(args.model), history=history)
+
+    async def run():
+        server = await serve(service, args.host, args.port)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Precomputed session calendar for the weekend and trading-region flags.
+
+The notebook built its London/Asia flags with three ``indexer_between_time``
+scans plus chained ``.iloc`` writes, and the weekend flag with another pass
+over ``dayofweek``. :class:`SessionCalendar` instead turns every timestamp into
+a minute of the week once and reads all flags from one bit-packed lookup table
+(one table per time zone, for sessions defined in local time):
+
+    >>> calendar = SessionCalendar([LONDON, ASIA, US])
+    >>> bits = calendar.bits(minutes)          # uint8, bit i is calendar.names[i]
+    >>> flags = calendar.unpack(bits)          # {'weekend': uint8, 'London': uint8, ...}
+
+Sessions in a zone other than UTC follow its daylight-saving shifts: the UTC
+offset is resolved once per hour of the requested range, not per minute.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+# 1970-01-01 was a Thursday (dayofweek 3).
+EPOCH_WEEKDAY = 3
+ALL_DAYS = (0, 1, 2, 3, 4, 5, 6)
+
+
+def clock_minute(value: str) -> int:
+    """``'HH:MM'`` to minute of day."""
+    hours, minutes = value.split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+@dataclass(frozen=True)
+class Session:
+    """A named set of ``('HH:MM', 'HH:MM')`` windows, both ends inclusive.
+
+    Windows may wrap past midnight. ``tz`` is the zone the clock times and
+    ``days`` (Monday=0) refer to.
+    """
+
+    name: str
+    windows: tuple
+    tz: str = 'UTC'
+    days: tuple = ALL_DAYS
+
+    def day_mask(self) -> np.ndarray:
+        """Boolean flag for every minute of the (local) week."""
+        minute_of_day = np.arange(MINUTES_PER_DAY)
+        day = np.zeros(MINUTES_PER_DAY, dtype=bool)
+        for start, end in self.windows:
+            lo, hi = clock_minute(start), clock_minute(end)
+            if lo <= hi:
+                day |= (minute_of_day >= lo) & (minute_of_day <= hi)
+            else:
+                day |= (minute_of_day >= lo) | (minute_of_day <= hi)
+        week = np.zeros((7, MINUTES_PER_DAY), dtype=bool)
+        week[list(self.days)] = day
+        return week.ravel()
+
+
+# The notebook's regions, in UTC exactly as its indexer_between_time calls.
+LONDON = Session('London', (('07:00', '13:30'),))
+ASIA = Session('Asia', (('21:00', '23:59'), ('00:00', '07:00')))
+# New York cash session, following US daylight saving time.
+US = Session('US', (('09:30', '16:00'),), tz='America/New_York', days=(0, 1, 2, 3, 4))
+
+NOTEBOOK_SESSIONS = (LONDON, ASIA)
+
+
+def as_session(session) -> Session:
+    """Accept a :class:`Session` or a ``(name, windows)`` pair."""
+    return session if isinstance(session, Session) else Session(*session)
+
+
+class SessionCalendar:
+    """All session flags plus ``weekend`` from one lookup per time zone."""
+
+    def __init__(self, sessions=NOTEBOOK_SESSIONS, weekend_days=(5, 6)):
+        self.sessions = [as_session(s) for s in sessions]
+        self.names = ['weekend'] + [s.name for s in self.sessions]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError(f'duplicate session names in {self.names}')
+        self.dtype = np.min_scalar_type(2 ** len(self.names) - 1)
+
+        weekend = Session('weekend', (('00:00', '23:59'),), 'UTC', tuple(weekend_days))
+        # One bit-packed minute-of-week table per zone.
+        self.tables = {}
+        for bit, session in enumerate([weekend] + self.sessions):
+            table = self.tables.setdefault(session.tz, np.zeros(MINUTES_PER_WEEK, dtype=self.dtype))
+            table |= (session.day_mask().astype(self.dtype) << bit).astype(self.dtype)
+
+    @staticmethod
+    def _local_offsets(minutes: np.ndarray, tz: str) -> np.ndarray:
+        # UTC offset in minutes, looked up once per hour spanned by ``minutes``.
+        hours = minutes // 60
+        first = int(hours.min())
+        grid = pd.date_range(pd.Timestamp(first * 3600, unit='s', tz='UTC'),
+                             periods=int(hours.max()) - first + 1, freq=pd.Timedelta(hours=1))
+        local = grid.tz_convert(tz).tz_localize(None)
+        offsets = ((local - grid.tz_localize(None)) // pd.Timedelta(minutes=1)).to_numpy(dtype=np.int64)
+        return offsets[hours - first]
+
+    def bits(self, minutes) -> np.ndarray:
+        """Bit-packed flags; bit ``i`` is set when ``names[i]`` applies."""
+        minutes = np.asarray(minutes, dtype=np.int64)
+        out = np.zeros(minutes.shape, dtype=self.dtype)
+        if not minutes.size:
+            return out
+        for tz, table in self.tables.items():
+            local = minutes if tz == 'UTC' else minutes + self._local_offsets(minutes, tz)
+            out |= self._lookup(table, local)
+        return out
+
+    @staticmethod
+    def _lookup(table: np.ndarray, local: np.ndarray) -> np.ndarray:
+        # table[minute of week]: index a copy of the table repeated over the
+        # weeks spanned, which saves the modulo when the minutes are dense.
+        lo, hi = int(local.min()), int(local.max())
+        first = lo - (lo + EPOCH_WEEKDAY * MINUTES_PER_DAY) % MINUTES_PER_WEEK
+        if hi - first >= 2 * len(local) + MINUTES_PER_WEEK:
+            return table[(local + EPOCH_WEEKDAY * MINUTES_PER_DAY) % MINUTES_PER_WEEK]
+        return np.resize(table, hi - first + 1)[local - first]
+
+    def unpack(self, bits: np.ndarray) -> dict:
+        """``{name: uint8 flag}`` columns from :meth:`bits`."""
+        return {name: ((bits >> i) & 1).astype(np.uint8) for i, name in enumerate(self.names)}
+
+    def flags(self, minutes) -> dict:
+        return self.unpack(self.bits(minutes))
@@ -0,0 +1,89 @@
+"""Share read-only NumPy arrays with worker processes without pickling them.
+
+Process pools normally pickle every argument to every worker, which for a
+2M-row design matrix costs more than the work itself. :class:`SharedArrays`
+copies a dict of arrays into one ``multiprocessing.shared_memory`` block once;
+workers call :func:`attach` with the small picklable :attr:`SharedArrays.layout`
+(typically from a pool initializer) and get zero-copy views. Arrays built only
+to be shared can be written straight into the block with
+:meth:`SharedArrays.empty`.
+
+    >>> with SharedArrays({'Z': Z}) as shared:
+    ...     with ProcessPoolExecutor(initializer=attach, initargs=(shared.layout,)) as pool:
+    ...         ...
+    >>> # in the worker
+    >>> arrays()['Z']
+"""
+from __future__ import annotations
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Offsets are rounded up so every array starts on a cache line.
+ALIGN = 64
+
+_attached = {}
+
+
+def _round_up(n: int) -> int:
+    return -(-n // ALIGN) * ALIGN
+
+
+class SharedArrays:
+    """Context manager owning one shared memory block holding several arrays."""
+
+    def __init__(self, arrays: dict):
+        arrays = {name: np.asarray(array) for name, array in arrays.items()}
+        self._allocate({name: (array.shape, array.dtype) for name, array in arrays.items()})
+        for name, array in arrays.items():
+            self.arrays[name][...] = array
+
+    @classmethod
+    def empty(cls, shapes: dict) -> 'SharedArrays':
+        """Uninitialized shared arrays, ``shapes`` mapping names to ``(shape, dtype)``.
+
+        Fill :attr:`arrays` in place to skip building a private copy first.
+        """
+        shared = cls.__new__(cls)
+        shared._allocate(shapes)
+        return shared
+
+    def _allocate(self, shapes: dict) -> None:
+        entries, offset = [], 0
+        for name, (shape, dtype) in shapes.items():
+            shape, dtype = tuple(shape), np.dtype(dtype)
+            entries.append((name, offset, shape, dtype.str))
+            offset = _round_up(offset + int(np.prod(shape)) * dtype.itemsize)
+        self.block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.layout = (self.block.name, tuple(entries))
+        self.arrays = _views(self.block, entries)
+
+    def close(self) -> None:
+        self.arrays = None
+        self.block.close()
+        self.block.unlink()
+
+    def __enter__(self) -> 'SharedArrays':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _views(block: shared_memory.SharedMemory, entries) -> dict:
+    return {name: np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+            for name, offset, shape, dtype in entries}
+
+
+def attach(layout) -> None:
+    """Map the arrays described by ``layout`` into this (worker) process."""
+    name, entries = layout
+    block = shared_memory.SharedMemory(name=name)
+    _attached['block'] = block
+    _attached['arrays'] = _views(block, entries)
+
+
+def arrays() -> dict:
+    """The arrays mapped by the last :func:`attach` in this process."""
+    return _attached['arrays']
@@ -0,0 +1,209 @@
+"""Month-partitioned columnar store for 1-minute candles.
+
+The notebook used to ``pd.read_pickle`` the whole 2019-2023 history and then
+re-parse the index with ``pd.to_datetime``. The store keeps every candle
+column as its own ``.npy`` file per calendar month, next to an int64
+``minute`` index (minutes since the Unix epoch, UTC)::
+
+    store/
+        meta.json
+        2019-01/minute.npy
+        2019-01/open.npy
+        ...
+
+Reads memory-map only the partitions and columns that were asked for, so
+loading a single month of ``close`` prices touches a few MB instead of the
+full pickle.
+
+    >>> store = convert_pickle('./binance-eth-usdt-spot-1m-2019-2023.pkl', './eth-usdt-1m')
+    >>> d = store.load(start='2022-01-01', end='2023-01-01')
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from profiling import stage
+
+CANDLE_COLUMNS = ('open', 'high', 'low', 'close', 'vwap', 'volume', 'usd_volume', 'count')
+INDEX_COLUMN = 'minute'
+META_FILE = 'meta.json'
+NS_PER_MINUTE = 60_000_000_000
+
+
+def to_minutes(index) -> np.ndarray:
+    """Convert a datetime-like index to int64 minutes since the epoch (UTC)."""
+    # asi8 counts UTC ticks (wall-clock ticks if naive, which are taken as UTC
+    # like to_datetime(utc=True) does); floor like a datetime64[m] cast would.
+    idx = index if isinstance(index, pd.DatetimeIndex) else pd.DatetimeIndex(pd.to_datetime(index, utc=True))
+    return idx.asi8 // (np.timedelta64(1, 'm') // np.timedelta64(1, idx.unit))
+
+
+def from_minutes(minutes) -> pd.DatetimeIndex:
+    """Inverse of :func:`to_minutes`, returning the notebook's UTC ``time`` index."""
+    stamps = (np.asarray(minutes, dtype=np.int64) * NS_PER_MINUTE).view('datetime64[ns]')
+    return pd.DatetimeIndex(stamps, name='time').tz_localize('UTC')
+
+
+def _as_minute(value) -> int | None:
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return int(to_minutes([value])[0])
+
+
+def _partition_keys(minutes: np.ndarray) -> np.ndarray:
+    return minutes.astype('datetime64[m]').astype('datetime64[M]').astype(str)
+
+
+def write_frame(frame: pd.DataFrame, path: str, overwrite: bool = False) -> 'CandleStore':
+    """Write a candle frame (datetime index, candle columns) to a store at ``path``."""
+    if os.path.exists(path):
+        if not overwrite:
+            raise FileExistsError(f'{path} already exists, pass overwrite=True to replace it')
+        shutil.rmtree(path)
+    os.makedirs(path)
+
+    minutes = to_minutes(frame.index)
+    order = np.argsort(minutes, kind='stable')
+    minutes = minutes[order]
+    if len(minutes) > 1 and (np.diff(minutes) == 0).any():
+        raise ValueError('candle index contains duplicate minutes')
+
+    columns = list(frame.columns)
+    values = {c: frame[c].to_numpy()[order] for c in columns}
+
+    keys = _partition_keys(minutes)
+    bounds = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    starts = np.concatenate([[0], bounds])
+    stops = np.concatenate([bounds, [len(minutes)]])
+
+    partitions = []
+    for lo, hi in zip(starts, stops):
+        if lo == hi:
+            continue
+        key = str(keys[lo])
+        part = os.path.join(path, key)
+        os.makedirs(part)
+        np.save(os.path.join(part, INDEX_COLUMN + '.npy'), minutes[lo:hi])
+        for c in columns:
+            np.save(os.path.join(part, c + '.npy'), values[c][lo:hi])
+        partitions.append({'key': key, 'start': int(minutes[lo]), 'stop': int(minutes[hi - 1]) + 1, 'rows': int(hi - lo)})
+
+    meta = {
+        'columns': {c: values[c].dtype.str for c in columns},
+        'partitions': partitions,
+    }
+    with open(os.path.join(path, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=1)
+    return CandleStore(path)
+
+
+def convert_pickle(pkl_path: str, path: str, overwrite: bool = False) -> 'CandleStore':
+    """One-time conversion of the notebook's candle pickle into a :class:`CandleStore`."""
+    return write_frame(pd.read_pickle(pkl_path), path, overwrite=overwrite)
+
+
+class CandleStore:
+    """Read-only view over a store written by :func:`write_frame`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        self.dtypes = {c: np.dtype(t) for c, t in meta['columns'].items()}
+        self.partitions = meta['partitions']
+
+    @property
+    def columns(self) -> list:
+        return list(self.dtypes)
+
+    def __len__(self) -> int:
+        return sum(p['rows'] for p in self.partitions)
+
+    def _column(self, key: str, column: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, key, column + '.npy'), mmap_mode='r')
+
+    def read(self, columns=None, start=None, end=None) -> dict:
+        """Return ``{'minute': ..., column: ...}`` arrays for ``start <= time < end``.
+
+        Arrays from a single partition are read-only memory maps; ranges that
+        span several months are concatenated, so only the requested slice is
+        ever copied into memory.
+        """
+        columns = self.columns if columns is None else list(columns)
+        missing = [c for c in columns if c not in self.dtypes]
+        if missing:
+            raise KeyError(f'columns not in store: {missing}')
+        with stage('load.store') as timed:
+            out = self._read(columns, start, end)
+            timed.rows = len(out[INDEX_COLUMN])
+        return out
+
+    def _read(self, columns, start, end) -> dict:
+        lo, hi = _as_minute(start), _as_minute(end)
+
+        chunks = {c: [] for c in [INDEX_COLUMN] + columns}
+        for p in self.partitions:
+            if (lo is not None and p['stop'] <= lo) or (hi is not None and p['start'] >= hi):
+                continue
+            minutes = self._column(p['key'], INDEX_COLUMN)
+            i = 0 if lo is None or p['start'] >= lo else int(np.searchsorted(minutes, lo))
+            j = len(minutes) if hi is None or p['stop'] <= hi else int(np.searchsorted(minutes, hi))
+            if i == j:
+                continue
+            chunks[INDEX_COLUMN].append(minutes[i:j])
+            for c in columns:
+                chunks[c].append(self._column(p['key'], c)[i:j])
+
+        out = {}
+        for c, parts in chunks.items():
+            dtype = np.int64 if c == INDEX_COLUMN else self.dtypes[c]
+            if not parts:
+                out[c] = np.empty(0, dtype=dtype)
+            elif len(parts) == 1:
+                out[c] = parts[0]
+            else:
+                out[c] = np.concatenate(parts)
+        return out
+
+    def iter_partitions(self, columns=None, start=None, end=None):
+        """Yield :meth:`read` dicts one partition at a time, clipped to ``[start, end)``."""
+        lo, hi = _as_minute(start), _as_minute(end)
+        for p in self.partitions:
+            if (lo is not None and p['stop'] <= lo) or (hi is not None and p['start'] >= hi):
+                continue
+            p_lo = p['start'] if lo is None else max(p['start'], lo)
+            p_hi = p['stop'] if hi is None else min(p['stop'], hi)
+            yield self.read(columns, p_lo, p_hi)
+
+    def load(self, columns=None, start=None, end=None) -> pd.DataFrame:
+        """Like :meth:`read` but returns the notebook's ``d`` frame with a UTC ``time`` index."""
+        arrays = self.read(columns, start, end)
+        index = from_minutes(arrays.pop(INDEX_COLUMN))
+        return pd.DataFrame(arrays, index=index, copy=False)
+
+
+def read_candles(path: str, columns=None, start=None, end=None) -> dict:
+    """Read candle arrays from a store directory or, failing that, the original pickle."""
+    if os.path.isdir(path):
+        return CandleStore(path).read(columns, start, end)
+    with stage('load.pickle') as timed:
+        frame = pd.read_pickle(path)
+        timed.rows = len(frame)
+    with stage('load.index', len(frame)):
+        minutes = to_minutes(frame.index)
+    keep = np.ones(len(minutes), dtype=bool)
+    if start is not None:
+        keep &= minutes >= _as_minute(start)
+    if end is not None:
+        keep &= minutes < _as_minute(end)
+    columns = list(frame.columns) if columns is None else list(columns)
+    out = {INDEX_COLUMN: minutes[keep]}
+    out.update({c: frame[c].to_numpy()[keep] for c in columns})
+    return out
@@ -0,0 +1,102 @@
+"""Out-of-core training over multi-year, multi-pair minute histories.
+
+Holding a whole history plus every derived column in RAM does not scale past
+one pair. Here candles are streamed one store partition (a month) at a time
+through :func:`features.feature_matrix`. Each chunk is prefixed with the last
+``warmup + target_horizon`` candles of the one before it, so MA60, the 60
+minute returns and the 15 minute target come out exactly as in a single batch
+pass. Feature rows are folded straight into a :class:`regression.GramStats`,
+so peak memory is bounded by the chunk size rather than the history length.
+
+    >>> reg = fit_streaming(['./eth-usdt-1m', './btc-usdt-1m'])
+"""
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from features import FeatureSpec, candle_arrays, feature_matrix, valid_rows
+from regression import GramStats, Regression
+from store import CANDLE_COLUMNS, INDEX_COLUMN, CandleStore, read_candles
+
+
+def iter_chunks(source, chunk_rows: int | None = None, start=None, end=None):
+    """Yield candle array dicts, one per store partition, from ``source``.
+
+    ``source`` is a store path or :class:`store.CandleStore`; a pickle path,
+    candle frame or array dict is accepted too but has to be read whole, so
+    convert large pickles with :func:`store.convert_pickle` first.
+    ``chunk_rows`` further splits each block.
+    """
+    if isinstance(source, str):
+        source = CandleStore(source) if os.path.isdir(source) else read_candles(source, start=start, end=end)
+    if isinstance(source, CandleStore):
+        blocks = source.iter_partitions(CANDLE_COLUMNS, start, end)
+    else:
+        blocks = [candle_arrays(source)]
+    for block in blocks:
+        n = len(block[INDEX_COLUMN])
+        step = chunk_rows or n or 1
+        for lo in range(0, n, step):
+            yield {k: np.asarray(v[lo:lo + step]) for k, v in block.items()}
+
+
+def stream_features(chunks, spec: FeatureSpec | None = None, dtype=np.float64):
+    """Yield ``(minutes, matrix)`` blocks of NaN-free feature rows from candle chunks.
+
+    The concatenation of the blocks equals the rows of
+    :func:`features.build_features` on the concatenated candles.
+    """
+    spec = spec or FeatureSpec()
+    horizon = spec.target_horizon
+    keep = spec.warmup + horizon
+    carry = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = {k: np.concatenate([carry[k], chunk[k]]) for k in chunk}
+            first = max(len(carry[INDEX_COLUMN]) - horizon, 0)
+        else:
+            first = 0
+        matrix = feature_matrix(chunk, spec, dtype)
+        rows = valid_rows(matrix, spec)
+        lo = max(first, rows.start)
+        if rows.contiguous:
+            if lo < rows.stop:
+                yield chunk[INDEX_COLUMN][lo:rows.stop], matrix[lo:rows.stop]
+        else:
+            valid = rows.valid
+            valid[:first] = False
+            if valid.any():
+                yield chunk[INDEX_COLUMN][valid], matrix[valid]
+        # Rows already emitted only need to stay as history for the next chunk.
+        carry = {k: v[-keep:] for k, v in chunk.items()}
+
+
+def accumulate(sources, spec: FeatureSpec | None = None, target: str = 'target',
+               chunk_rows: int | None = None, start=None, end=None, dtype=np.float64) -> GramStats:
+    """Stream every source through the feature kernel into one :class:`GramStats`.
+
+    ``sources`` is one source of :func:`iter_chunks` or a list of them.
+    Window state is carried within a source, never across sources.
+    """
+    spec = spec or FeatureSpec()
+    columns = spec.columns
+    j = columns.index(target)
+    features = [i for i in range(len(columns)) if i != j]
+    stats = GramStats(len(features))
+    single = isinstance(sources, (str, CandleStore, pd.DataFrame, dict))
+    for source in ([sources] if single else sources):
+        for _, matrix in stream_features(iter_chunks(source, chunk_rows, start, end), spec, dtype):
+            stats.update(matrix[:, features], matrix[:, j])
+    return stats
+
+
+def fit_streaming(sources, model: Regression | None = None, spec: FeatureSpec | None = None,
+                  target: str = 'target', chunk_rows: int | None = None, start=None, end=None) -> Regression:
+    """Fit ``model`` (every linear model of :class:`regression.Regression`) out of core."""
+    spec = spec or FeatureSpec()
+    model = model or Regression()
+    model.feature_names_ = [c for c in spec.columns if c != target]
+    return model.fit_stats(accumulate(sources, spec, target, chunk_rows, start, end))
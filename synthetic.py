@@ -0,0 +1,45 @@
+"""Synthetic 1-minute candles shaped like the Binance ETH-USDT pickle.
+
+The real data path is a private pickle that is not in the repo, so benchmarks
+and replays use these instead: a geometric random walk per symbol with
+intraday volatility, plus consistent OHLC, vwap, volume, usd_volume and trade
+count columns.
+
+    >>> d = synthetic_candles(months=12)['SYM000']
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from store import CANDLE_COLUMNS
+
+
+def synthetic_frame(minutes: int, start='2019-01-01', seed: int = 0, price: float = 130.0,
+                    volatility: float = 1e-3) -> pd.DataFrame:
+    """One symbol's candles with the notebook's ``d`` layout (UTC ``time`` index)."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(pd.Timestamp(start, tz='UTC'), periods=minutes, freq=pd.Timedelta(minutes=1), name='time')
+    # Busier, more volatile hours around the London/New York overlap.
+    hour = index.hour.to_numpy()
+    activity = 1 + 0.5 * np.exp(-0.5 * ((hour - 14) / 3) ** 2)
+    close = price * np.exp(np.cumsum(rng.normal(0, volatility, minutes) * activity))
+    open_ = np.concatenate([[price], close[:-1]])
+    wick = np.abs(rng.normal(0, volatility / 2, (2, minutes))) * activity
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+    vwap = low + (high - low) * rng.uniform(0.25, 0.75, minutes)
+    count = rng.poisson(60 * activity).astype(np.int64) + 1
+    volume = count * rng.lognormal(0, 0.75, minutes)
+    frame = pd.DataFrame({
+        'open': open_.round(2), 'high': high.round(2), 'low': low.round(2), 'close': close.round(2),
+        'vwap': vwap, 'volume': volume, 'usd_volume': volume * vwap, 'count': count,
+    }, index=index)
+    return frame[list(CANDLE_COLUMNS)]
+
+
+def synthetic_candles(months: float = 1, symbols: int = 1, start='2019-01-01', seed: int = 0) -> dict:
+    """``{'SYM000': frame, ...}`` covering ``months`` (30-day) months per symbol."""
+    minutes = int(months * 30 * 24 * 60)
+    return {f'SYM{i:03d}': synthetic_frame(minutes, start, seed + i, price=10 + 190 * (i % 7 + 1) / 7)
+            for i in range(symbols)}
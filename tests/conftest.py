@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, next to this directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import synthetic_candles  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def candles():
+    """About six days of synthetic minute candles."""
+    return synthetic_candles(months=0.2)['SYM000']
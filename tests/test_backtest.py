@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+import backtest
+from backtest import param_grid
+from sessions import MINUTES_PER_DAY
+from store import to_minutes
+
+HORIZON = 15
+
+
+def naive_backtest(prediction, d, row, overlapping):
+    # One parameter set, one minute at a time: (total_return, max_drawdown, traded, daily PnL).
+    close = d.close.to_numpy()
+    spread = ((d.high - d.low) / d.vwap).to_numpy()
+    minutes = to_minutes(d.index)
+    signals = []
+    for p in prediction:
+        if not np.isfinite(p) or abs(p) <= row.threshold:
+            s = 0.0
+        elif row.sizing == 'sign':
+            s = np.sign(p)
+        else:
+            s = np.clip(p / row.scale, -1, 1)
+        signals.append(s if row.allow_short else max(s, 0.0))
+    positions, held = [], 0.0
+    for t in range(len(minutes)):
+        if overlapping:
+            positions.append(sum(signals[max(0, t - HORIZON + 1):t + 1]) / HORIZON)
+        else:
+            if minutes[t] % HORIZON == 0:
+                held = signals[t]
+            positions.append(held)
+    equity = peak = drawdown = previous = traded = 0.0
+    daily = {}
+    for t in range(len(minutes)):
+        r = close[t] / close[t - 1] - 1 if t else 0.0
+        pnl = previous * r - abs(positions[t] - previous) * (row.fee + row.slippage * spread[t])
+        traded += abs(positions[t] - previous)
+        previous = positions[t]
+        equity += pnl
+        peak = max(peak, equity)
+        drawdown = max(drawdown, peak - equity)
+        day = minutes[t] // MINUTES_PER_DAY
+        daily[day] = daily.get(day, 0.0) + pnl
+    return equity, drawdown, traded, np.array(list(daily.values()))
+
+
+@pytest.fixture(scope='module')
+def prediction(candles):
+    rng = np.random.default_rng(0)
+    p = (candles.close.shift(-HORIZON) / candles.close - 1).to_numpy() * 0.3 + rng.normal(0, 1e-3, len(candles))
+    p[:50] = np.nan
+    return p
+
+
+@pytest.mark.parametrize('overlapping', [True, False])
+def test_matches_minute_by_minute_loop(candles, prediction, overlapping, monkeypatch):
+    # Small chunks, so the carried state between chunks is exercised too.
+    monkeypatch.setattr(backtest, 'CHUNK_ELEMENTS', 1000)
+    params = param_grid(threshold=[0, 5e-4], sizing=['sign', 'linear'], allow_short=[True, False])
+    result = backtest.backtest(prediction, candles, params, horizon=HORIZON, overlapping=overlapping)
+    for i, row in params.iterrows():
+        equity, drawdown, traded, daily = naive_backtest(prediction, candles, row, overlapping)
+        metrics = result.metrics.iloc[i]
+        assert metrics.total_return == pytest.approx(equity, rel=1e-9, abs=1e-12)
+        assert metrics.max_drawdown == pytest.approx(drawdown, rel=1e-9, abs=1e-12)
+        assert metrics.turnover_per_day * len(result.daily) == pytest.approx(traded, rel=1e-9)
+        np.testing.assert_allclose(result.daily[i].to_numpy(), daily, rtol=1e-9, atol=1e-12)
@@ -0,0 +1,20 @@
+import numpy as np
+
+from cache import FeatureCache, fingerprint
+from features import build_features
+from store import write_frame
+
+
+def test_rewritten_store_is_rebuilt(candles, tmp_path):
+    # Same minutes and row counts, so meta.json is byte for byte the same.
+    path = str(tmp_path / 'candles')
+    write_frame(candles, path)
+    cache = FeatureCache(str(tmp_path / 'cache'))
+    before = fingerprint(path)
+    np.testing.assert_array_equal(cache.get_or_build(path).frame().to_numpy(), build_features(candles).to_numpy())
+
+    doubled = candles.copy()
+    doubled[['open', 'high', 'low', 'close', 'vwap']] *= 2
+    write_frame(doubled, path, overwrite=True)
+    assert fingerprint(path) != before
+    np.testing.assert_array_equal(cache.get_or_build(path).frame().to_numpy(), build_features(doubled).to_numpy())
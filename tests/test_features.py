@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import features
+from features import FeatureSpec, build_features, feature_matrix
+from store import to_minutes
+
+MA_COLUMNS = ['MA5', 'MA15', 'MA30', 'MA60']
+
+
+def notebook_columns(d):
+    # The notebook's feature cell, with its chained .iloc assignments written as plain ones.
+    data = d.copy()
+    data['c-o'] = data['close'] - data['open']
+    data['h-l'] = data['high'] - data['low']
+    data['open returns'] = data['open'].pct_change()
+    data['high returns'] = data['high'].pct_change()
+    data['open returns'] = data['low'].pct_change()
+    data['close returns'] = data['close'].pct_change()
+    data['vwap returns'] = data['vwap'].pct_change()
+    for w in (5, 15, 30, 60):
+        data[f'MA{w}'] = data['close returns'].rolling(w).mean()
+    for k in (5, 15, 30, 60):
+        data[f'{k} min returns'] = data.close / data.shift(k).close - 1
+    data['VolCount'] = data['volume'] / data['count']
+    data['day'] = data.index.dayofweek
+    data['weekend'] = 0
+    data.loc[data['day'] > 4, 'weekend'] = 1
+    data['London'] = 0
+    data['Asia'] = 0
+    london, asia = data.columns.get_loc('London'), data.columns.get_loc('Asia')
+    data.iloc[data.index.indexer_between_time('07:00:00', '13:30:00', include_start=True), london] = 1
+    data.iloc[data.index.indexer_between_time('21:00:00', '23:59:00', include_start=True), asia] = 1
+    data.iloc[data.index.indexer_between_time('00:00:00', '07:00:00', include_start=True), asia] = 1
+    data['target'] = data.shift(-15).close / data.close - 1
+    return data
+
+
+def notebook_features(d):
+    data = notebook_columns(d).dropna()
+    data.drop(['open', 'high', 'low', 'close', 'day'], axis=1, inplace=True)
+    return data
+
+
+@pytest.fixture(scope='module')
+def gappy(candles):
+    # A missing price and a minute without trades, which the cell drops as NaN rows.
+    d = candles.copy()
+    d.iloc[500, d.columns.get_loc('close')] = np.nan
+    d.iloc[900, d.columns.get_loc('volume')] = 0
+    d.iloc[900, d.columns.get_loc('count')] = 0
+    return d
+
+
+@pytest.mark.parametrize('data', ['candles', 'gappy'])
+def test_build_features_matches_notebook(data, request):
+    d = request.getfixturevalue(data)
+    expected = notebook_features(d)
+    data = build_features(d)
+    assert list(data.columns) == list(expected.columns)
+    assert data.dtypes.equals(expected.dtypes)
+    pd.testing.assert_index_equal(data.index, expected.index, exact=False)
+    # Everything but the rolling means is the same arithmetic; those come from prefix sums.
+    pd.testing.assert_frame_equal(data.drop(columns=MA_COLUMNS), expected.drop(columns=MA_COLUMNS),
+                                  check_exact=True, check_index_type=False, check_freq=False)
+    pd.testing.assert_frame_equal(data[MA_COLUMNS], expected[MA_COLUMNS], rtol=1e-9, atol=0,
+                                  check_index_type=False, check_freq=False)
+
+
+def test_feature_matrix_holds_the_frame_rows(gappy):
+    data = build_features(gappy)
+    matrix = feature_matrix(gappy)
+    rows = np.searchsorted(to_minutes(gappy.index), to_minutes(data.index))
+    np.testing.assert_array_equal(matrix[rows], data.to_numpy(dtype=np.float64))
+
+
+@pytest.mark.parametrize('data', ['candles', 'gappy'])
+def test_feature_matrix_matches_notebook_columns(data, request):
+    # Every row, including the NaN warm-up and look-ahead margins.
+    d = request.getfixturevalue(data)
+    expected = notebook_columns(d)[FeatureSpec().columns].to_numpy(dtype=np.float64)
+    matrix = feature_matrix(d)
+    np.testing.assert_array_equal(np.isnan(matrix), np.isnan(expected))
+    np.testing.assert_allclose(matrix, expected, rtol=1e-9, atol=1e-15)
+
+
+@pytest.mark.parametrize('data', ['candles', 'gappy'])
+def test_blocks_do_not_change_the_result(data, request, monkeypatch):
+    # The NumPy kernels work in row blocks; seams must not show in any column.
+    d = request.getfixturevalue(data)
+    whole = build_features(d), feature_matrix(d)
+    monkeypatch.setattr(features, 'BLOCK_ELEMENTS', 1000)
+    blocked = build_features(d), feature_matrix(d)
+    pd.testing.assert_frame_equal(blocked[0], whole[0], check_exact=True)
+    assert blocked[0].attrs['dropped'] == whole[0].attrs['dropped']
+    np.testing.assert_array_equal(blocked[1], whole[1])
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from features import FeatureSpec, build_features
+from gaps import MAX_FILL, dense_features, resample
+from store import to_minutes
+
+SPEC = FeatureSpec()
+
+
+@pytest.fixture(scope='module')
+def outages(candles):
+    # A 600 minute outage and a 5 minute one, well inside the candles.
+    drop = np.r_[2000:2600, 5000:5005]
+    return candles.drop(candles.index[drop]), (2000, 2600), (5000, 5005)
+
+
+def test_long_gaps_are_filled_flat_only_up_to_max_fill(outages):
+    d, (lo, hi), (short_lo, short_hi) = outages
+    c = resample(d)
+    assert np.isnan(c['close'][lo:hi]).sum() == hi - lo - MAX_FILL
+    np.testing.assert_array_equal(c['close'][lo:lo + MAX_FILL], c['close'][lo - 1])
+    assert not np.isnan(c['close'][short_lo:short_hi]).any()
+
+
+def test_rows_near_a_gap_are_dropped(outages):
+    d, *gaps = outages
+    data = dense_features(d)
+    minutes = to_minutes(data.index)
+    first = to_minutes(d.index[:1])[0]
+    for lo, hi in gaps:
+        # No kept row looks back at, or ahead to, a filled minute.
+        near = (minutes >= first + lo - SPEC.target_horizon) & (minutes < first + hi + SPEC.warmup)
+        assert not near.any()
+    assert data.attrs['dropped']['gap fill'] == 605
+    assert data.attrs['dropped']['gap window'] == 2 * (SPEC.warmup + SPEC.target_horizon)
+    # Every kept row only sees consecutive real minutes, so it equals the row-based frame.
+    expected = build_features(d).loc[data.index]
+    np.testing.assert_array_equal(data.to_numpy(), expected.to_numpy())
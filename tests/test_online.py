@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from features import FeatureSpec, feature_matrix
+from online import FeatureEngine
+from store import CANDLE_COLUMNS, to_minutes
+
+COLUMNS = FeatureSpec().columns
+MA_COLUMNS = [COLUMNS.index(f'MA{w}') for w in FeatureSpec().ma_windows]
+# Columns computed with the same float operations as the batch kernel.
+EXACT_COLUMNS = [j for j in range(len(COLUMNS)) if j not in MA_COLUMNS and COLUMNS[j] != 'target']
+
+
+@pytest.fixture(scope='module')
+def gappy(candles):
+    # A missing price and a minute without trades.
+    d = candles.iloc[:3000].copy()
+    d.iloc[500, d.columns.get_loc('close')] = np.nan
+    d.iloc[900, d.columns.get_loc('volume')] = 0
+    d.iloc[900, d.columns.get_loc('count')] = 0
+    return d
+
+
+def assert_rows_equal(rows, expected):
+    np.testing.assert_array_equal(rows[:, EXACT_COLUMNS], expected[:, EXACT_COLUMNS])
+    # The engine keeps running sums for the MAs; the batch kernel takes prefix-sum differences.
+    np.testing.assert_allclose(rows[:, MA_COLUMNS], expected[:, MA_COLUMNS], rtol=1e-9, atol=1e-15)
+
+
+def test_update_many_matches_feature_matrix(gappy):
+    expected = feature_matrix(gappy)
+    rows = FeatureEngine().update_many(gappy)
+    assert rows.shape == expected.shape
+    assert_rows_equal(rows, expected)
+    assert np.isnan(rows[:, COLUMNS.index('target')]).all()
+
+
+def test_labelled_rows_match_feature_matrix(gappy):
+    expected = feature_matrix(gappy)
+    minutes = to_minutes(gappy.index)
+    engine = FeatureEngine()
+    labelled = []
+    for minute, *candle in zip(minutes.tolist(), *(gappy[k].tolist() for k in CANDLE_COLUMNS)):
+        engine.update(minute, *candle)
+        if engine.labelled is not None:
+            labelled.append(engine.labelled)
+    # Every row but the last target_horizon ones gets its target.
+    assert [m for m, _ in labelled] == minutes[:-FeatureSpec().target_horizon].tolist()
+    rows = np.vstack([row for _, row in labelled])
+    assert_rows_equal(rows, expected[:len(rows)])
+    np.testing.assert_array_equal(rows[:, -1], expected[:len(rows), -1])
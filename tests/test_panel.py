@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from features import FeatureSpec, feature_matrix
+from panel import Panel, fit_panel
+from regression import Regression
+from synthetic import synthetic_candles
+
+
+@pytest.fixture(scope='module')
+def late_listing():
+    # SYM002 lists after the training part of the range.
+    c = synthetic_candles(months=0.3, symbols=3)
+    c['SYM002'] = c['SYM002'].iloc[-1000:]
+    return c
+
+
+def test_symbols_without_training_rows_are_skipped(late_listing):
+    result = fit_panel(Panel.from_sources(late_listing), Regression(n_alphas=5))
+    assert result.models['SYM002'] is None
+    assert np.isnan(result.coef[2]).all() and np.isnan(result.intercept[2]).all()
+    metrics = result.metrics.set_index('symbol')
+    assert metrics.loc['SYM002', 'train_rows'].eq(0).all()
+    assert metrics.loc['SYM002', ['mse', 'r2']].isna().all().all()
+    assert metrics.loc[['SYM000', 'SYM001'], ['mse', 'r2']].notna().all().all()
+    # One alpha grid for every symbol.
+    assert result.labels[0] == result.labels[1] == result.labels[2] == result.models['SYM000'].labels_
+
+
+def test_panel_fit_matches_single_symbol_fit(late_listing):
+    # A symbol's panel fit is the plain fit of its complete rows before the split.
+    d = late_listing['SYM000']
+    result = fit_panel(Panel.from_sources({'SYM000': d}), Regression(models=('ols', 'ridge')))
+    matrix = feature_matrix(d)[:int(len(d) * 0.8)]
+    matrix = matrix[~np.isnan(matrix).any(axis=1)]
+    target = FeatureSpec().columns.index('target')
+    expected = Regression(models=('ols', 'ridge')).fit(np.delete(matrix, target, axis=1), matrix[:, target])
+    assert result.labels[0] == expected.labels_
+    np.testing.assert_allclose(result.coef[0], expected.coef_, rtol=1e-6)
+    np.testing.assert_allclose(result.intercept[0], expected.intercept_, rtol=1e-6, atol=1e-12)
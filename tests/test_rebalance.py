@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from panel import Panel
+from rebalance import Scenarios, bar_prices, simulate
+from synthetic import synthetic_candles
+
+
+def naive_rebalance(bar, prices, weights, frequency, band, fee):
+    # One scenario, one bar at a time: (total_return, rebalances).
+    weights = np.asarray(weights)
+    holdings = weights * (1 - fee)
+    rebalances = 0
+    for t in range(1, len(prices)):
+        holdings = holdings * np.nan_to_num(prices[t] / prices[t - 1], nan=1.0)
+        value = holdings.sum()
+        drift = np.abs(holdings / value - weights).max()
+        if (frequency > 0 and bar[t] % frequency == 0) or (band > 0 and drift > band):
+            traded = np.abs(weights * value - holdings).sum()
+            holdings = weights * (value - traded * fee)
+            rebalances += 1
+    return holdings.sum() - 1, rebalances
+
+
+@pytest.fixture(scope='module')
+def panel():
+    candles = synthetic_candles(months=1, symbols=3)
+    # One asset lists late, so its first bars have no price.
+    candles['SYM002'] = candles['SYM002'].iloc[5000:]
+    return Panel.from_sources(candles)
+
+
+def test_matches_bar_by_bar_loop(panel):
+    scenarios = Scenarios.grid([[1 / 3] * 3, [.5, .3, .2]], frequencies=[0, 24, 168], bands=[0, .02, .05],
+                               fees=[0.001, 0])
+    results = simulate(panel, scenarios, every=60)
+    bar, prices = bar_prices(panel.minutes, panel.candles['close'], 60)
+    for i in range(len(scenarios)):
+        total_return, rebalances = naive_rebalance(bar, prices, scenarios.weights[i], scenarios.frequency[i],
+                                                   scenarios.band[i], scenarios.fee[i])
+        assert results[i]['total_return'] == total_return
+        assert results[i]['rebalances'] == rebalances
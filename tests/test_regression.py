@@ -0,0 +1,76 @@
+import warnings
+
+import numpy as np
+import pytest
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import ElasticNet, Lasso, LinearRegression, Ridge
+from sklearn.preprocessing import StandardScaler
+
+from features import feature_rows
+from regression import Regression
+
+# Coordinate descent sweeps allowed to sklearn's Lasso/ElasticNet.
+MAX_ITER = 10_000
+
+
+@pytest.fixture(scope='module')
+def design(candles):
+    _, matrix, _ = feature_rows(candles)
+    X, y = matrix[:, :-1], matrix[:, -1]
+    # The notebook fits on standardized features.
+    return X, y, StandardScaler().fit(X)
+
+
+@pytest.fixture(scope='module')
+def fitted(design):
+    X, y, _ = design
+    return Regression(n_alphas=5).fit(X, y)
+
+
+def objective(Z, y, w, alpha, l1_ratio):
+    # sklearn's ElasticNet objective, at the optimal intercept.
+    residual = (y - y.mean()) - (Z - Z.mean(axis=0)) @ w
+    return (residual @ residual / (2 * len(y)) + alpha * l1_ratio * np.abs(w).sum()
+            + 0.5 * alpha * (1 - l1_ratio) * w @ w)
+
+
+def test_ols_matches_sklearn(design, fitted):
+    X, y, scaler = design
+    expected = LinearRegression().fit(scaler.transform(X), y)
+    i = fitted._index('ols', None)
+    np.testing.assert_allclose(fitted.coef_[i] * scaler.scale_, expected.coef_, rtol=1e-6, atol=1e-12)
+    np.testing.assert_allclose(fitted.predict(X), expected.predict(scaler.transform(X)), rtol=1e-6, atol=1e-12)
+
+
+def test_ridge_matches_sklearn(design, fitted):
+    X, y, scaler = design
+    Z = scaler.transform(X)
+    for i, (model, alpha) in enumerate(fitted.labels_):
+        if model == 'ridge':
+            expected = Ridge(alpha=alpha).fit(Z, y)
+            np.testing.assert_allclose(fitted.coef_[i] * scaler.scale_, expected.coef_, rtol=1e-7, atol=1e-14)
+            intercept = expected.intercept_ - expected.coef_ @ (scaler.mean_ / scaler.scale_)
+            np.testing.assert_allclose(fitted.intercept_[i], intercept, rtol=1e-9)
+
+
+@pytest.mark.parametrize('model', ['lasso', 'elasticnet'])
+def test_l1_objectives_match_sklearn(design, fitted, model):
+    # The feature-sign search solves exactly; sklearn's coordinate descent
+    # reaches the same objective when it converges, with coefficients that
+    # can still differ a little. At the smallest alphas it stops short.
+    X, y, scaler = design
+    Z = scaler.transform(X)
+    l1_ratio = 1.0 if model == 'lasso' else fitted.l1_ratio
+    for i, (name, alpha) in enumerate(fitted.labels_):
+        if name != model:
+            continue
+        estimator = Lasso(alpha=alpha) if model == 'lasso' else ElasticNet(alpha=alpha, l1_ratio=l1_ratio)
+        expected = estimator.set_params(tol=1e-12, max_iter=MAX_ITER)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', ConvergenceWarning)
+            expected.fit(Z, y)
+        ours = objective(Z, y, fitted.coef_[i] * scaler.scale_, alpha, l1_ratio)
+        theirs = objective(Z, y, expected.coef_, alpha, l1_ratio)
+        assert ours <= theirs * (1 + 1e-12)
+        if expected.n_iter_ < MAX_ITER:
+            assert ours == pytest.approx(theirs, rel=1e-12)
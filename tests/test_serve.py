@@ -0,0 +1,40 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from features import FeatureSpec
+from serve import InferenceService, Predictor, serve
+from store import CANDLE_COLUMNS, to_minutes
+
+
+def request(method, path, body=None):
+    # One HTTP request against a fresh server; returns (status, payload).
+    async def run():
+        p = len(FeatureSpec().columns) - 1
+        service = InferenceService(Predictor(np.r_[np.zeros(p), np.ones(p), np.full(p, 1e-3), 0.0]), ['ETH'])
+        server = await serve(service, port=0)
+        async with server:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            data = b'' if body is None else json.dumps(body).encode()
+            writer.write(f'{method} {path} HTTP/1.1\r\nContent-Length: {len(data)}\r\n\r\n'.encode() + data)
+            response = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+        head, payload = response.split(b'\r\n\r\n', 1)
+        return int(head.split()[1]), json.loads(payload)
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('body', [['ETH'], {'ETH': 1.0}, 'ETH'])
+def test_update_rejects_malformed_bodies(body):
+    status, payload = request('POST', '/update', body)
+    assert status == 400 and 'expected' in payload['error']
+
+
+def test_update_and_unknown_symbols(candles):
+    candle = candles.iloc[0]
+    body = {'ETH': {'minute': int(to_minutes(candles.index[:1])[0]), **{k: float(candle[k]) for k in CANDLE_COLUMNS}}}
+    assert request('POST', '/update', body) == (200, {'ETH': None})
+    assert request('POST', '/update', {'BTC': body['ETH']})[0] == 404
+    assert request('GET', '/health')[0] == 200
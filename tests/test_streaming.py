@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from features import FeatureSpec, candle_arrays, feature_rows
+from regression import Regression
+from store import write_frame
+from streaming import fit_streaming, iter_chunks, stream_features
+from synthetic import synthetic_candles
+
+MA_COLUMNS = [FeatureSpec().columns.index(f'MA{w}') for w in FeatureSpec().ma_windows]
+
+
+@pytest.fixture(scope='module')
+def source(tmp_path_factory):
+    # Six weeks, so the store has two month partitions, with a missing price inside the first.
+    d = synthetic_candles(months=1.5)['SYM000']
+    d.iloc[3000, d.columns.get_loc('close')] = np.nan
+    path = str(tmp_path_factory.mktemp('store') / 'candles')
+    write_frame(d, path)
+    return d, path
+
+
+@pytest.mark.parametrize('chunk_rows', [None, 1000, 7])
+def test_stream_matches_batch(source, chunk_rows):
+    d, path = source
+    minutes, matrix, _ = feature_rows(d)
+    blocks = list(stream_features(iter_chunks(path, chunk_rows)))
+    np.testing.assert_array_equal(np.concatenate([m for m, _ in blocks]), minutes)
+    streamed = np.vstack([x for _, x in blocks])
+    other = np.setdiff1d(np.arange(matrix.shape[1]), MA_COLUMNS)
+    np.testing.assert_array_equal(streamed[:, other], matrix[:, other])
+    # The rolling means are prefix-sum differences taken from a different origin in each chunk.
+    np.testing.assert_allclose(streamed[:, MA_COLUMNS], matrix[:, MA_COLUMNS], rtol=1e-9, atol=0)
+
+
+@pytest.mark.parametrize('kind', ['store', 'frame', 'arrays'])
+def test_fit_streaming_matches_batch_fit(source, kind):
+    d, path = source
+    _, matrix, _ = feature_rows(d)
+    batch = Regression(models=('ols', 'ridge')).fit(matrix[:, :-1], matrix[:, -1])
+    one = {'store': path, 'frame': d, 'arrays': candle_arrays(d)}[kind]
+    streamed = fit_streaming(one, Regression(models=('ols', 'ridge')), chunk_rows=5000)
+    np.testing.assert_allclose(streamed.coef_, batch.coef_, rtol=1e-8, atol=1e-12 * np.abs(batch.coef_).max())
+    np.testing.assert_allclose(streamed.intercept_, batch.intercept_, rtol=1e-8, atol=1e-14)